@@ -0,0 +1,70 @@
+"""Inserções de romancistas: SELECT prévio + INSERT x um único
+INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+Roda contra o DATABASE_URL das configurações, dentro de uma transação
+desfeita no final: nada fica gravado no banco.
+
+Uso: python -m benchmarks.bench_insercao
+"""
+
+from time import perf_counter
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from madr.models import Romancista, table_registry
+from madr.settings import Settings
+
+N = 2000
+# Uma em cada dez inserções repete um nome já existente
+REPETIDOS = 10
+
+
+def nomes(prefixo: str) -> list[str]:
+    return [
+        f'{prefixo} {i - 1 if i % REPETIDOS == 0 else i}' for i in range(N)
+    ]
+
+
+def verifica_e_insere(session: Session, nome: str) -> int | None:
+    # Caminho antigo: SELECT prévio, INSERT pelo ORM e refresh
+    if session.scalar(select(Romancista).where(Romancista.nome == nome)):
+        return None
+
+    romancista = Romancista(nome=nome)
+    session.add(romancista)
+    session.flush()
+    session.refresh(romancista)
+    return romancista.id
+
+
+def insere_on_conflict(session: Session, nome: str) -> int | None:
+    return session.scalar(
+        insert(Romancista)
+        .values(nome=nome)
+        .on_conflict_do_nothing(index_elements=['nome'])
+        .returning(Romancista.id)
+    )
+
+
+def bench(session: Session, funcao, prefixo: str) -> float:
+    inicio = perf_counter()
+    for nome in nomes(prefixo):
+        funcao(session, nome)
+    return N / (perf_counter() - inicio)
+
+
+if __name__ == '__main__':
+    engine = create_engine(Settings().DATABASE_URL)
+    with engine.connect() as conn:
+        transacao = conn.begin()
+        table_registry.metadata.create_all(conn)
+        with Session(bind=conn) as session:
+            antes = bench(session, verifica_e_insere, 'antes')
+            depois = bench(session, insere_on_conflict, 'depois')
+        transacao.rollback()
+
+    print(f'SELECT + INSERT:    {antes:8.0f} inserções/s')
+    print(f'INSERT ON CONFLICT: {depois:8.0f} inserções/s')
+    print(f'speedup:            {depois / antes:.1f}x')
@@ -0,0 +1,77 @@
+"""Leitura de uma página de livros: entidades ORM x colunas projetadas.
+
+Mede latência e pico de alocação (tracemalloc) por página. Usa SQLite em
+memória para isolar o custo de hidratação do ORM do custo do banco.
+
+Uso: python -m benchmarks.bench_projecao
+"""
+
+import tracemalloc
+from timeit import repeat
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from madr.consultas import COLUNAS_LIVRO
+from madr.models import Livro, Romancista
+from madr.schemas import LivroPublic
+
+TAMANHOS = (20, 100, 1000)
+N = 50
+
+engine = create_engine('sqlite://')
+Romancista.__table__.create(engine)
+Livro.__table__.create(engine)
+
+with engine.begin() as conn:
+    conn.execute(insert(Romancista), [{'nome': 'romancista'}])
+    conn.execute(
+        insert(Livro),
+        [
+            {'ano': 1900 + i % 100, 'titulo': f'livro {i}', 'romancista_id': 1}
+            for i in range(max(TAMANHOS))
+        ],
+    )
+
+
+def por_entidade(tamanho: int) -> list[dict]:
+    # Caminho antigo: hidrata Livro e copia os campos para o schema
+    with Session(engine) as session:
+        return [
+            LivroPublic.model_validate(
+                livro, from_attributes=True
+            ).model_dump()
+            for livro in session.scalars(select(Livro).limit(tamanho))
+        ]
+
+
+def por_colunas(tamanho: int) -> list[dict]:
+    with Session(engine) as session:
+        return [
+            linha._asdict()
+            for linha in session.execute(select(*COLUNAS_LIVRO).limit(tamanho))
+        ]
+
+
+def pico_kib(funcao, tamanho: int) -> float:
+    tracemalloc.start()
+    funcao(tamanho)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / 1024
+
+
+def bench(funcao, tamanho: int) -> tuple[float, float]:
+    melhor = min(repeat(lambda: funcao(tamanho), number=N))
+    return melhor / N * 1e6, pico_kib(funcao, tamanho)
+
+
+if __name__ == '__main__':
+    for tamanho in TAMANHOS:
+        entidade_us, entidade_kib = bench(por_entidade, tamanho)
+        colunas_us, colunas_kib = bench(por_colunas, tamanho)
+        print(
+            f'size={tamanho:>4}: '
+            f'entidades {entidade_us:8.1f} µs {entidade_kib:7.1f} KiB, '
+            f'colunas {colunas_us:8.1f} µs {colunas_kib:7.1f} KiB'
+        )
@@ -0,0 +1,71 @@
+"""Custo de serialização de uma página de livros: modelos Pydantic
+revalidados pelo response_model x tuplas serializadas com orjson.
+
+Uso: python -m benchmarks.bench_serializacao
+"""
+
+from collections import namedtuple
+from timeit import repeat
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from madr.paginacao import Pagina, pagina_json
+from madr.schemas import LivroList, LivroPublic
+
+TAMANHOS = (20, 100, 1000)
+N = 200
+
+Linha = namedtuple('Linha', ['id', 'ano', 'titulo', 'romancista_id'])
+livro_list = TypeAdapter(LivroList)
+
+
+def caminho_pydantic(livros: list[SimpleNamespace]) -> bytes:
+    # O que get_livros fazia: um LivroPublic por linha, e o FastAPI
+    # despeja, revalida e serializa de novo contra o response_model
+    resposta = LivroList(
+        total=len(livros),
+        livros=[
+            LivroPublic(
+                id=i.id,
+                ano=i.ano,
+                titulo=i.titulo,
+                romancista_id=i.romancista_id,
+            )
+            for i in livros
+        ],
+        page=1,
+        size=len(livros),
+        pages=1,
+    )
+    validado = livro_list.validate_python(resposta.model_dump())
+    return JSONResponse(livro_list.dump_python(validado, mode='json')).body
+
+
+def caminho_orjson(linhas: list[Linha]) -> bytes:
+    pagina = Pagina(
+        items=linhas, size=len(linhas), total=len(linhas), page=1, pages=1
+    )
+    return pagina_json(pagina, 'livros').body
+
+
+def bench(tamanho: int) -> tuple[float, float]:
+    linhas = [
+        Linha(i, 1900 + i % 100, f'livro {i}', i % 50) for i in range(tamanho)
+    ]
+    livros = [SimpleNamespace(**linha._asdict()) for linha in linhas]
+
+    pydantic = min(repeat(lambda: caminho_pydantic(livros), number=N))
+    orjson = min(repeat(lambda: caminho_orjson(linhas), number=N))
+    return pydantic / N * 1e6, orjson / N * 1e6
+
+
+if __name__ == '__main__':
+    for tamanho in TAMANHOS:
+        pydantic, orjson = bench(tamanho)
+        print(
+            f'size={tamanho:>4}: pydantic {pydantic:9.1f} µs/página, '
+            f'orjson {orjson:8.1f} µs/página, '
+            f'speedup {pydantic / orjson:.1f}x'
+        )
@@ -0,0 +1,32 @@
+"""Custo de autenticação por requisição com e sem o cache de tokens.
+
+Uso: python -m benchmarks.bench_token_cache
+"""
+
+from timeit import repeat
+
+from madr import security
+from madr.security import create_access_token, decode_access_token
+
+N = 20_000
+
+
+def bench(enabled: bool) -> float:
+    security.settings.TOKEN_CACHE_ENABLED = enabled
+    security.token_cache.clear()
+    token = create_access_token({
+        'sub': 'bench@test.com',
+        'uid': 1,
+        'username': 'bench',
+    })
+
+    melhor = min(repeat(lambda: decode_access_token(token), number=N))
+    return melhor / N * 1e6
+
+
+if __name__ == '__main__':
+    sem_cache = bench(enabled=False)
+    com_cache = bench(enabled=True)
+    print(f'sem cache: {sem_cache:.2f} µs/req')
+    print(f'com cache: {com_cache:.2f} µs/req')
+    print(f'speedup:   {sem_cache / com_cache:.1f}x')
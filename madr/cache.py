@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable, Protocol
+
+from madr.settings import Settings
+
+
+class TTLCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at <= monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache(Protocol):
+    # Interface assíncrona para que um backend compatível com Redis possa
+    # substituir o cache em memória; os valores são dicts serializáveis
+    async def get(self, key: str) -> dict | None: ...
+
+    async def set(self, key: str, value: dict): ...
+
+    async def delete(self, *keys: str): ...
+
+    async def clear(self): ...
+
+    def stats(self) -> dict: ...
+
+
+class LRUResponseCache:
+    def __init__(self, max_size: int, ttl: float, invalidacao: float = 5.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        # Chaves invalidadas há pouco: uma leitura que buscou a linha antes
+        # da escrita não pode regravá-la no cache depois do delete
+        self._invalidadas = TTLCache(max_size=max_size, ttl=invalidacao)
+
+    async def get(self, key: str) -> dict | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: dict):
+        if self._invalidadas.get(key):
+            return
+        self._cache.set(key, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.delete(key)
+            self._invalidadas.set(key, True)
+
+    async def clear(self):
+        self._cache.clear()
+        self._invalidadas.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+settings = Settings()
+response_cache: ResponseCache = LRUResponseCache(
+    max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    invalidacao=settings.RESPONSE_CACHE_INVALIDATION_SECONDS,
+)
+
+
+def get_cache() -> ResponseCache:  # pragma: no cover
+    return response_cache
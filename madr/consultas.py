@@ -0,0 +1,77 @@
+from typing import Any
+
+from sqlalchemy import ARRAY, Integer, any_, bindparam
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select, select
+from sqlalchemy.sql.elements import ColumnElement
+
+from madr.models import Livro, Romancista
+
+# Camada de leitura: os GETs selecionam só as colunas públicas e recebem
+# tuplas (Row), sem hidratar entidades nem registrá-las no identity map
+COLUNAS_LIVRO = (Livro.id, Livro.ano, Livro.titulo, Livro.romancista_id)
+COLUNAS_ROMANCISTA = (Romancista.id, Romancista.nome)
+
+# Romancistas marcados na exclusão em lotes somem na hora, com os livros.
+# Quase sempre não há nenhum: o NOT IN vira um hashed SubPlan sobre o
+# índice parcial ix_romancistas_excluido, bem mais barato que um EXISTS
+# por linha de `livros` nas contagens e ETags do catálogo inteiro
+ROMANCISTA_VISIVEL = Romancista.excluido.is_(False)
+LIVRO_VISIVEL = Livro.romancista_id.not_in(
+    select(Romancista.id).where(Romancista.excluido)
+)
+
+
+def projeta_livros(query: Select) -> Select:
+    return query.with_only_columns(*COLUNAS_LIVRO)
+
+
+def projeta_romancistas(query: Select) -> Select:
+    return query.with_only_columns(*COLUNAS_ROMANCISTA)
+
+
+async def busca_livro(session: AsyncSession, livro_id: int) -> Row | None:
+    return (
+        await session.execute(
+            select(*COLUNAS_LIVRO, Livro.versao).where(
+                (Livro.id == livro_id) & LIVRO_VISIVEL
+            )
+        )
+    ).one_or_none()
+
+
+async def busca_romancista(
+    session: AsyncSession, romancista_id: int
+) -> Row | None:
+    return (
+        await session.execute(
+            select(*COLUNAS_ROMANCISTA, Romancista.versao).where(
+                (Romancista.id == romancista_id) & ROMANCISTA_VISIVEL
+            )
+        )
+    ).one_or_none()
+
+
+async def busca_por_ids(
+    session: AsyncSession,
+    colunas: tuple,
+    ids: list[int],
+    visivel: ColumnElement[bool],
+) -> tuple[list[dict[str, Any]], list[int]]:
+    # Uma única consulta com = ANY(:ids) no lugar de uma por id; a primeira
+    # coluna é a chave primária
+    id_column = colunas[0]
+    encontrados = {
+        linha.id: linha._asdict()
+        for linha in await session.execute(
+            select(*colunas).where(
+                id_column == any_(bindparam('ids', ids, ARRAY(Integer))),
+                visivel,
+            )
+        )
+    }
+    itens = [encontrados[i] for i in ids if i in encontrados]
+    faltando = [i for i in ids if i not in encontrados]
+
+    return itens, faltando
@@ -1,11 +1,91 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from dataclasses import asdict, dataclass
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from madr.settings import Settings
 
-engine = create_engine(Settings().DATABASE_URL)
+settings = Settings()
+
+
+@dataclass
+class PoolMetrics:
+    connects: int = 0
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_count: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_count += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+class MedeEspera:
+    # Mede a espera dentro do próprio pool, no checkout que a sessão faz
+    # na primeira consulta: a conexão continua sendo pega só quando usada
+    def _do_get(self):
+        inicio = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.record_wait(perf_counter() - inicio)
+
+
+class PoolMedido(MedeEspera, AsyncAdaptedQueuePool):
+    pass
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    poolclass=PoolMedido,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+    pool_use_lifo=settings.DATABASE_POOL_USE_LIFO,
+)
+
+
+@event.listens_for(engine.sync_engine, 'connect')
+def _on_connect(dbapi_connection, connection_record):  # pragma: no cover
+    pool_metrics.connects += 1
+
+
+@event.listens_for(engine.sync_engine, 'checkout')
+def _on_checkout(  # pragma: no cover
+    dbapi_connection, connection_record, connection_proxy
+):
+    pool_metrics.checkouts += 1
+
+
+def pool_status() -> dict:
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+        **asdict(pool_metrics),
+    }
+
+
+def get_engine():  # pragma: no cover
+    return engine
 
 
-def get_session():  # pragma: no cover
-    with Session(engine) as session:
+async def get_session():  # pragma: no cover
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
@@ -0,0 +1,125 @@
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+
+import psycopg
+from sqlalchemy.engine import make_url
+
+from madr.settings import Settings
+from madr.utils import sanitiza_nome
+
+PROGRESSO_A_CADA = 50_000
+
+CARGAS = {
+    'romancistas': {
+        'staging': 'CREATE TEMP TABLE staging_romancistas (nome text)'
+        ' ON COMMIT DROP',
+        'copy': 'COPY staging_romancistas (nome) FROM STDIN',
+        'merge': 'INSERT INTO romancistas (nome)'
+        ' SELECT DISTINCT nome FROM staging_romancistas'
+        ' ON CONFLICT (nome) DO NOTHING',
+    },
+    'livros': {
+        'staging': 'CREATE TEMP TABLE staging_livros'
+        ' (titulo text, ano integer, romancista text) ON COMMIT DROP',
+        'copy': 'COPY staging_livros (titulo, ano, romancista) FROM STDIN',
+        'merge': 'INSERT INTO livros (titulo, ano, romancista_id)'
+        ' SELECT DISTINCT ON (s.titulo) s.titulo, s.ano, r.id'
+        ' FROM staging_livros s JOIN romancistas r ON r.nome = s.romancista'
+        # Romancistas marcados para a purga não recebem livros novos
+        ' AND NOT r.excluido'
+        ' ORDER BY s.titulo'
+        ' ON CONFLICT (titulo) DO NOTHING',
+    },
+}
+
+
+def le_registros(arquivo: Path) -> Iterator[dict]:
+    with arquivo.open(encoding='utf-8', newline='') as f:
+        if arquivo.suffix in {'.ndjson', '.jsonl'}:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+        else:
+            yield from csv.DictReader(f)
+
+
+def prepara_linha(tabela: str, registro: dict) -> tuple:
+    if tabela == 'romancistas':
+        return (sanitiza_nome(registro['nome']),)
+
+    return (
+        sanitiza_nome(registro['titulo']),
+        int(registro['ano']),
+        sanitiza_nome(registro['romancista']),
+    )
+
+
+def carrega(
+    conn: psycopg.Connection, tabela: str, registros: Iterator[dict]
+) -> tuple[int, int]:
+    carga = CARGAS[tabela]
+    inicio = perf_counter()
+    lidas = 0
+
+    with conn.cursor() as cur:
+        cur.execute(carga['staging'])
+        with cur.copy(carga['copy']) as copy:
+            for registro in registros:
+                copy.write_row(prepara_linha(tabela, registro))
+                lidas += 1
+                if lidas % PROGRESSO_A_CADA == 0:
+                    reporta(tabela, lidas, perf_counter() - inicio)
+
+        cur.execute(carga['merge'])
+        inseridas = cur.rowcount
+
+    conn.commit()
+    return lidas, inseridas
+
+
+def reporta(tabela: str, linhas: int, segundos: float):
+    print(
+        f'{tabela}: {linhas} linhas em {segundos:.1f}s'
+        f' ({linhas / max(segundos, 1e-9):.0f} linhas/s)',
+        file=sys.stderr,
+    )
+
+
+def conecta(database_url: str) -> psycopg.Connection:
+    # O psycopg não entende o sufixo de driver do SQLAlchemy
+    url = make_url(database_url).set(drivername='postgresql')
+    return psycopg.connect(url.render_as_string(hide_password=False))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog='python -m madr.load',
+        description='Carga inicial do acervo via COPY.',
+    )
+    parser.add_argument('tabela', choices=CARGAS)
+    parser.add_argument('arquivo', type=Path, help='arquivo CSV ou NDJSON')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or Settings().DATABASE_URL
+    inicio = perf_counter()
+    with conecta(database_url) as conn:
+        lidas, inseridas = carrega(
+            conn, args.tabela, le_registros(args.arquivo)
+        )
+
+    reporta(args.tabela, lidas, perf_counter() - inicio)
+    print(
+        f'{args.tabela}: {inseridas} inseridas,'
+        f' {lidas - inseridas} ignoradas',
+        file=sys.stderr,
+    )
+
+
+if __name__ == '__main__':
+    main()
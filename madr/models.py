@@ -1,8 +1,16 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, ForeignKey, Index, event, text
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 table_registry = registry()
 
+# Índices trigram (GIN) atendem tanto `LIKE '%termo%'` quanto a busca por
+# similaridade usada no modo de relevância
+event.listen(
+    table_registry.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'),
+)
+
 
 @table_registry.mapped_as_dataclass
 class User:
@@ -17,24 +25,65 @@ class User:
 @table_registry.mapped_as_dataclass
 class Romancista:
     __tablename__ = 'romancistas'
+    __table_args__ = (
+        Index(
+            'ix_romancistas_nome_trgm',
+            'nome',
+            postgresql_using='gin',
+            postgresql_ops={'nome': 'gin_trgm_ops'},
+        ),
+        # Só os poucos marcados para a purga: o NOT IN das listagens de
+        # livros lê este índice em vez da tabela inteira
+        Index(
+            'ix_romancistas_excluido',
+            'id',
+            postgresql_where=text('excluido'),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     nome: Mapped[str] = mapped_column(unique=True)
+    versao: Mapped[int] = mapped_column(
+        init=False, default=1, server_default='1'
+    )
+    # Marcado na exclusão em lotes, até a purga apagar a linha
+    excluido: Mapped[bool] = mapped_column(
+        init=False, default=False, server_default='false'
+    )
     livros: Mapped[list['Livro']] = relationship(
         init=False,
         back_populates='romancista',
         cascade='all, delete-orphan',
+        # O banco apaga os livros (ON DELETE CASCADE); o ORM não os carrega
+        passive_deletes=True,
     )
 
 
 @table_registry.mapped_as_dataclass
 class Livro:
     __tablename__ = 'livros'
+    __table_args__ = (
+        Index(
+            'ix_livros_titulo_trgm',
+            'titulo',
+            postgresql_using='gin',
+            postgresql_ops={'titulo': 'gin_trgm_ops'},
+        ),
+        # Filtro por ano e chave estrangeira, com `id` para seguir a ordem
+        # das listagens e dos lotes da purga
+        Index('ix_livros_ano_id', 'ano', 'id'),
+        Index('ix_livros_romancista_id_id', 'romancista_id', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     ano: Mapped[int]
     titulo: Mapped[str] = mapped_column(unique=True)
-    romancista_id: Mapped[int] = mapped_column(ForeignKey('romancistas.id'))
+    romancista_id: Mapped[int] = mapped_column(
+        ForeignKey('romancistas.id', ondelete='CASCADE')
+    )
+    versao: Mapped[int] = mapped_column(
+        init=False, default=1, server_default='1'
+    )
     romancista: Mapped[Romancista] = relationship(
         init=False,
         back_populates='livros',
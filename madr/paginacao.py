@@ -0,0 +1,212 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from dataclasses import dataclass
+from hashlib import sha256
+from http import HTTPStatus
+from math import ceil
+from typing import Any, Literal, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from fastapi_pagination import Params
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Executable, Select, select
+from sqlalchemy.sql.elements import ClauseElement, ColumnElement
+
+from madr.utils import etag
+
+Contagem = Literal['exact', 'estimate', 'none']
+
+
+@dataclass
+class Pagina:
+    items: Sequence[Any]
+    size: int
+    total: int | None = None
+    page: int | None = None
+    pages: int | None = None
+    next_cursor: str | None = None
+
+
+def encode_cursor(last_id: int) -> str:
+    return urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        last_id = json.loads(urlsafe_b64decode(cursor.encode()))['id']
+    except (Base64Error, ValueError, TypeError, KeyError):
+        last_id = None
+
+    if not isinstance(last_id, int):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='cursor inválido',
+        )
+
+    return last_id
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+async def _linhas(session: AsyncSession, query: Select) -> Sequence[Any]:
+    # Consultas por colunas devolvem tuplas (Row); por entidade, objetos ORM
+    if len(query.column_descriptions) > 1:
+        return (await session.execute(query)).all()
+
+    return (await session.scalars(query)).all()
+
+
+def pagina_json(
+    pagina: Pagina, chave: str, headers: dict[str, str] | None = None
+) -> ORJSONResponse:
+    # Serializa as tuplas direto com orjson, no formato de LivroList e
+    # RomancistaList, sem criar e revalidar um modelo Pydantic por linha
+    return ORJSONResponse(
+        {
+            'total': pagina.total,
+            chave: [linha._asdict() for linha in pagina.items],
+            'page': pagina.page,
+            'size': pagina.size,
+            'pages': pagina.pages,
+            'next_cursor': pagina.next_cursor,
+        },
+        headers=headers,
+    )
+
+
+async def contar(
+    session: AsyncSession, query: Select, count: Contagem
+) -> int | None:
+    query = query.order_by(None)
+
+    if count == 'exact':
+        return await session.scalar(
+            select(func.count()).select_from(query.subquery())
+        )
+
+    if count == 'estimate':
+        # Estimativa do planejador (pg_class.reltuples + estatísticas)
+        plano = await session.scalar(Explain(query))
+        return int(plano[0]['Plan']['Plan Rows'])
+
+    return None
+
+
+async def pagina_por_offset(  # noqa: PLR0913, PLR0917
+    session: AsyncSession,
+    query: Select,
+    params: Params,
+    count: Contagem = 'exact',
+    id_column: ColumnElement | None = None,
+    total: int | None = None,
+) -> Pagina:
+    if id_column is not None:
+        query = query.order_by(id_column)
+
+    # Um item a mais indica se existe próxima página, mesmo sem contagem
+    offset = (params.page - 1) * params.size
+    items = await _linhas(session, query.limit(params.size + 1).offset(offset))
+    has_next = len(items) > params.size
+    items = items[: params.size]
+
+    if total is None:
+        total = await contar(session, query, count)
+
+    next_cursor = None
+    if id_column is not None and has_next:
+        next_cursor = encode_cursor(items[-1].id)
+
+    return Pagina(
+        items=items,
+        size=params.size,
+        total=total,
+        page=params.page,
+        pages=ceil(total / params.size) if total is not None else None,
+        next_cursor=next_cursor,
+    )
+
+
+async def etag_colecao(
+    session: AsyncSession, query: Select, variante: str
+) -> tuple[str, int]:
+    # count + max(id) + sum(versao) mudam a cada inserção, remoção ou
+    # atualização; a variante (query string) separa filtros e páginas
+    colecao = query.order_by(None).subquery()
+    total, max_id, soma_versoes = (
+        await session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.max(colecao.c.id), 0),
+                func.coalesce(func.sum(colecao.c.versao), 0),
+            ).select_from(colecao)
+        )
+    ).one()
+    assinatura = f'{variante}|{total}|{max_id}|{soma_versoes}'
+
+    return etag(sha256(assinatura.encode()).hexdigest()[:32]), total
+
+
+async def pagina_por_cursor(
+    session: AsyncSession,
+    query: Select,
+    id_column: ColumnElement,
+    cursor: str,
+    size: int,
+) -> Pagina:
+    if cursor:
+        query = query.where(id_column > decode_cursor(cursor))
+
+    # Um item a mais indica se existe próxima página, sem `count(*)`
+    items = await _linhas(session, query.order_by(id_column).limit(size + 1))
+
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor(items[-1].id)
+
+    return Pagina(items=items, size=size, next_cursor=next_cursor)
+
+
+async def paginar(  # noqa: PLR0913, PLR0917
+    session: AsyncSession,
+    query: Select,
+    params: Params,
+    id_column: ColumnElement,
+    cursor: str | None,
+    por_relevancia: bool,
+    count: Contagem = 'exact',
+    total: int | None = None,
+) -> Pagina:
+    if cursor is None:
+        return await pagina_por_offset(
+            session,
+            query,
+            params,
+            count,
+            None if por_relevancia else id_column,
+            total,
+        )
+
+    if por_relevancia:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='cursor não é suportado na busca por relevância',
+        )
+
+    return await pagina_por_cursor(
+        session, query, id_column, cursor, params.size
+    )
@@ -0,0 +1,89 @@
+from dataclasses import asdict, dataclass
+from typing import Literal
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.sql import delete, select
+
+from madr.cache import ResponseCache, TTLCache
+from madr.models import Livro, Romancista
+from madr.settings import Settings
+
+settings = Settings()
+
+StatusPurga = Literal['pendente', 'executando', 'concluida', 'falhou']
+
+
+@dataclass
+class Purga:
+    romancista_id: int
+    id: str
+    status: StatusPurga = 'pendente'
+    livros_apagados: int = 0
+    erro: str | None = None
+
+
+# Jobs concluídos expiram sozinhos; o status só existe neste processo
+purgas = TTLCache(
+    max_size=settings.PURGE_JOBS_MAX_SIZE, ttl=settings.PURGE_JOBS_TTL_SECONDS
+)
+
+
+def nova_purga(romancista_id: int) -> Purga:
+    purga = Purga(romancista_id=romancista_id, id=uuid4().hex)
+    purgas.set(purga.id, purga)
+    return purga
+
+
+def status_purga(purga_id: str) -> dict | None:
+    purga = purgas.get(purga_id)
+    return asdict(purga) if purga else None
+
+
+async def _apaga_lote(
+    engine: AsyncEngine, romancista_id: int, tamanho: int
+) -> list[int]:
+    # Cada lote é uma transação curta: os locks em `livros` duram só o
+    # tempo de apagar `tamanho` linhas
+    async with AsyncSession(engine) as session:
+        lote = (
+            select(Livro.id)
+            .where(Livro.romancista_id == romancista_id)
+            .limit(tamanho)
+            .scalar_subquery()
+        )
+        livro_ids = (
+            await session.scalars(
+                delete(Livro).where(Livro.id.in_(lote)).returning(Livro.id)
+            )
+        ).all()
+        await session.commit()
+
+    return livro_ids
+
+
+async def executa_purga(
+    engine: AsyncEngine, cache: ResponseCache, purga: Purga
+):
+    purga.status = 'executando'
+    try:
+        while True:
+            livro_ids = await _apaga_lote(
+                engine, purga.romancista_id, settings.PURGE_BATCH_SIZE
+            )
+            purga.livros_apagados += len(livro_ids)
+            await cache.delete(*(f'livro:{i}' for i in livro_ids))
+            if len(livro_ids) < settings.PURGE_BATCH_SIZE:
+                break
+
+        async with AsyncSession(engine) as session:
+            await session.execute(
+                delete(Romancista).where(Romancista.id == purga.romancista_id)
+            )
+            await session.commit()
+    except Exception as erro:
+        purga.status = 'falhou'
+        purga.erro = str(erro)
+        return
+
+    purga.status = 'concluida'
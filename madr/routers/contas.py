@@ -2,56 +2,69 @@ from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import delete, update
 
 from madr.database import get_session
 from madr.models import User
 from madr.schemas import UserPublic, UserSchema
 from madr.security import (
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
+    revoke_user,
 )
 from madr.utils import sanitiza_nome
 
 router = APIRouter(prefix='/user', tags=['contas'])
 
-T_Session = Annotated[Session, Depends(get_session)]
+T_Session = Annotated[AsyncSession, Depends(get_session)]
 T_Current_User = Annotated[User, Depends(get_current_user)]
 
 
+def _conta_removida(user_id: int, email: str):
+    # O token autenticou por um snapshot em cache de uma conta que já foi
+    # apagada (por exemplo, em outro worker): descarta o cache e recusa
+    revoke_user(user_id, email)
+    raise HTTPException(
+        status_code=HTTPStatus.UNAUTHORIZED,
+        detail='Não autorizado',
+    )
+
+
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=UserPublic)
-def create_user(
+async def create_user(
     user: UserSchema,
     session: T_Session,
 ):
-    username_sanitizado = sanitiza_nome(user.username)
-    db_user = session.scalar(
-        select(User).where(
-            (User.username == username_sanitizado) | (User.email == user.email)
+    # Username e e-mail únicos: o conflito em qualquer um dos dois vira 409
+    db_user = (
+        await session.execute(
+            insert(User)
+            .values(
+                username=sanitiza_nome(user.username),
+                email=user.email,
+                password=await get_password_hash_async(user.password),
+            )
+            .on_conflict_do_nothing()
+            .returning(User.id, User.username, User.email)
         )
-    )
+    ).one_or_none()
 
-    if db_user:
+    if db_user is None:
+        await session.rollback()
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
             detail='conta já consta no MADR',
         )
+    await session.commit()
 
-    db_user = User(
-        username=username_sanitizado,
-        email=user.email,
-        password=get_password_hash(user.password),
-    )
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-
-    return db_user
+    return db_user._asdict()
 
 
 @router.put('/{user_id}', response_model=UserPublic)
-def update_user(
+async def update_user(
     user_id: int,
     user: UserSchema,
     session: T_Session,
@@ -63,36 +76,40 @@ def update_user(
             detail='Não autorizado',
         )
 
-    # Verifica se username ou email já existem para outro id
-    username_sanitizado = sanitiza_nome(user.username)
-    db_user = session.scalar(
-        select(User).where(
-            (
-                (User.username == username_sanitizado)
-                | (User.email == user.email)
+    # Username e e-mail únicos: um único UPDATE ... RETURNING, com o
+    # conflito com outra conta vindo da constraint
+    old_email = current_user.email
+    try:
+        db_user = (
+            await session.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(
+                    username=sanitiza_nome(user.username),
+                    email=user.email,
+                    password=await get_password_hash_async(user.password),
+                )
+                .returning(User.id, User.username, User.email)
             )
-            & (User.id != user_id)
-        )
-    )
-    if db_user:
+        ).one_or_none()
+    except IntegrityError:
+        await session.rollback()
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
             detail='conta já consta no MADR',
         )
 
-    current_user.username = username_sanitizado
-    current_user.email = user.email
-    current_user.password = get_password_hash(user.password)
+    if db_user is None:
+        _conta_removida(user_id, old_email)
 
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    await session.commit()
+    revoke_user(user_id, old_email)
 
-    return current_user
+    return db_user._asdict()
 
 
 @router.delete('/{user_id}')
-def delete_user(
+async def delete_user(
     user_id: int,
     session: T_Session,
     current_user: T_Current_User,
@@ -103,7 +120,13 @@ def delete_user(
             detail='Não autorizado',
         )
 
-    session.delete(current_user)
-    session.commit()
+    db_user_id = await session.scalar(
+        delete(User).where(User.id == user_id).returning(User.id)
+    )
+    if db_user_id is None:
+        _conta_removida(user_id, current_user.email)
+
+    await session.commit()
+    revoke_user(user_id, current_user.email)
 
     return {'message': 'Conta deletada com sucesso'}
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from typing import Annotated, AsyncIterator, Literal
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.sql import select
+
+from madr.consultas import ROMANCISTA_VISIVEL
+from madr.database import get_engine
+from madr.models import Livro, Romancista
+from madr.settings import Settings
+
+router = APIRouter(prefix='/export', tags=['exportacao'])
+settings = Settings()
+
+T_Engine = Annotated[AsyncEngine, Depends(get_engine)]
+
+COLUNAS_LIVROS = ('id', 'titulo', 'ano', 'romancista_id', 'romancista')
+
+
+async def _particoes_livros(engine: AsyncEngine) -> AsyncIterator[list]:
+    # A sessão da requisição é fechada antes do corpo ser enviado, então o
+    # stream abre a sua própria, com cursor no servidor
+    async with AsyncSession(engine) as session:
+        result = await session.stream(
+            select(
+                Livro.id,
+                Livro.titulo,
+                Livro.ano,
+                Livro.romancista_id,
+                Romancista.nome,
+            )
+            .join(Romancista, Livro.romancista_id == Romancista.id)
+            .where(ROMANCISTA_VISIVEL)
+            .order_by(Livro.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        async for particao in result.partitions():
+            yield particao
+
+
+async def _ndjson(engine: AsyncEngine) -> AsyncIterator[str]:
+    async for particao in _particoes_livros(engine):
+        yield ''.join(
+            json.dumps(dict(zip(COLUNAS_LIVROS, row)), ensure_ascii=False)
+            + '\n'
+            for row in particao
+        )
+
+
+async def _csv(engine: AsyncEngine) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUNAS_LIVROS)
+
+    async for particao in _particoes_livros(engine):
+        writer.writerows(particao)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get('/livros')
+async def export_livros(
+    engine: T_Engine,
+    formato: Literal['ndjson', 'csv'] = 'ndjson',
+):
+    if formato == 'csv':
+        return StreamingResponse(
+            _csv(engine),
+            media_type='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=livros.csv'},
+        )
+
+    return StreamingResponse(
+        _ndjson(engine), media_type='application/x-ndjson'
+    )
@@ -1,174 +1,437 @@
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 from fastapi_pagination import Params
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import select
+from psycopg.errors import ForeignKeyViolation, UniqueViolation
+from pydantic import ValidationError
+from sqlalchemy import ARRAY, Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import delete, literal, select, update
 
+from madr.cache import ResponseCache, get_cache
+from madr.consultas import (
+    COLUNAS_LIVRO,
+    LIVRO_VISIVEL,
+    ROMANCISTA_VISIVEL,
+    busca_livro,
+    busca_por_ids,
+    projeta_livros,
+)
 from madr.database import get_session
-from madr.models import Livro, Romancista, User
+from madr.models import Livro, Romancista
+from madr.paginacao import Contagem, etag_colecao, pagina_json, paginar
 from madr.schemas import (
+    LivroBulk,
+    LivroBulkResultado,
+    LivroComRomancista,
     LivroList,
+    LivroLote,
     LivroPublic,
     LivroSchema,
     LivroUpdate,
+    UserPublic,
+)
+from madr.security import get_current_principal
+from madr.settings import Settings
+from madr.utils import (
+    Busca,
+    etag,
+    filtra_por_termo,
+    get_params,
+    ler_lote,
+    nao_modificado,
+    sanitiza_nome,
+    valida_ids,
 )
-from madr.security import get_current_user
-from madr.utils import get_params, sanitiza_nome
 
 router = APIRouter(prefix='/livros', tags=['livros'])
+settings = Settings()
 
-T_Session = Annotated[Session, Depends(get_session)]
-T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_Session = Annotated[AsyncSession, Depends(get_session)]
+T_CurrentUser = Annotated[UserPublic, Depends(get_current_principal)]
 T_Page = Annotated[Params, Depends(get_params)]
+T_Cache = Annotated[ResponseCache, Depends(get_cache)]
 
 
 @router.post('/', response_model=LivroPublic)
-def create_livro(
+async def create_livro(
     livro: LivroSchema,
     session: T_Session,
     current_user: T_CurrentUser,
 ):
-    titulo_sanitizado = sanitiza_nome(livro.titulo)
-    db_livro = session.scalar(
-        select(Livro).where(
-            (Livro.titulo == titulo_sanitizado)
-            & (Livro.romancista_id == livro.romancista_id)
+    # Um único INSERT ... SELECT: só insere com o romancista visível, e a
+    # unicidade do título fica com o ON CONFLICT, sem SELECTs prévios
+    try:
+        db_livro = (
+            await session.execute(
+                insert(Livro)
+                .from_select(
+                    ['titulo', 'ano', 'romancista_id'],
+                    select(
+                        literal(sanitiza_nome(livro.titulo)),
+                        literal(livro.ano),
+                        Romancista.id,
+                    ).where(
+                        (Romancista.id == livro.romancista_id)
+                        & ROMANCISTA_VISIVEL
+                    ),
+                )
+                .on_conflict_do_nothing()
+                .returning(*COLUNAS_LIVRO)
+            )
+        ).one_or_none()
+    except IntegrityError as erro:
+        # O romancista foi apagado entre o SELECT e o INSERT
+        await session.rollback()
+        if not isinstance(erro.orig, ForeignKeyViolation):
+            raise
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='romancista não encontrado',
         )
-    )
 
-    if db_livro:
+    if db_livro is None:
+        # Só no caminho de erro: nada inserido pelo romancista ou pelo título
+        romancista_visivel = await session.scalar(
+            select(Romancista.id).where(
+                (Romancista.id == livro.romancista_id) & ROMANCISTA_VISIVEL
+            )
+        )
+        await session.rollback()
+        if romancista_visivel is None:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='romancista não encontrado',
+            )
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
             detail='livro já consta no MADR',
         )
+    await session.commit()
+
+    return db_livro._asdict()
+
+
+def _valida_lote(
+    itens: list,
+) -> tuple[dict[int, LivroBulkResultado], dict[str, tuple[int, LivroSchema]]]:
+    resultados = {}
+    validos = {}
+    for indice, item in enumerate(itens):
+        try:
+            livro = LivroSchema.model_validate(item)
+        except ValidationError:
+            resultados[indice] = LivroBulkResultado(
+                indice=indice, status='invalido'
+            )
+            continue
+
+        titulo = sanitiza_nome(livro.titulo)
+        if titulo in validos:
+            resultados[indice] = LivroBulkResultado(
+                indice=indice, status='duplicado'
+            )
+            continue
+
+        validos[titulo] = (indice, livro)
+
+    return resultados, validos
+
+
+@router.post(
+    '/bulk',
+    response_model=LivroBulk,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {
+                'application/json': {
+                    'schema': {
+                        'type': 'array',
+                        'items': {'$ref': '#/components/schemas/LivroSchema'},
+                    }
+                },
+                'application/x-ndjson': {'schema': {'type': 'string'}},
+            },
+        }
+    },
+)
+async def create_livros_bulk(
+    request: Request,
+    session: T_Session,
+    current_user: T_CurrentUser,
+):
+    resultados, validos = _valida_lote(await ler_lote(request))
 
-    db_romancista = session.scalar(
-        select(Romancista).where(Romancista.id == livro.romancista_id)
+    # Os ids vão num único array (= ANY): com IN seria um parâmetro por
+    # id, e o protocolo do Postgres aceita no máximo 65535
+    romancista_ids = list({
+        livro.romancista_id for _, livro in validos.values()
+    })
+    romancistas_existentes = set(
+        await session.scalars(
+            select(Romancista.id).where(
+                Romancista.id
+                == any_(bindparam('ids', romancista_ids, ARRAY(Integer))),
+                ROMANCISTA_VISIVEL,
+            )
+        )
     )
 
-    if db_romancista is None:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND,
-            detail='romancista não encontrado',
+    linhas = []
+    for titulo, (indice, livro) in validos.items():
+        if livro.romancista_id not in romancistas_existentes:
+            resultados[indice] = LivroBulkResultado(
+                indice=indice, status='romancista_nao_encontrado'
+            )
+            continue
+
+        linhas.append({
+            'titulo': titulo,
+            'ano': livro.ano,
+            'romancista_id': livro.romancista_id,
+        })
+
+    criados = {}
+    for inicio in range(0, len(linhas), settings.BULK_BATCH_SIZE):
+        lote = linhas[inicio : inicio + settings.BULK_BATCH_SIZE]
+        inseridos = await session.execute(
+            insert(Livro)
+            .values(lote)
+            .on_conflict_do_nothing(index_elements=['titulo'])
+            .returning(Livro.id, Livro.titulo)
         )
+        criados.update({titulo: id_ for id_, titulo in inseridos})
+    await session.commit()
 
-    db_livro = Livro(
-        titulo=titulo_sanitizado,
-        ano=livro.ano,
-        romancista_id=livro.romancista_id,
-    )
-    session.add(db_livro)
-    session.commit()
-    session.refresh(db_livro)
+    for linha in linhas:
+        indice = validos[linha['titulo']][0]
+        livro_id = criados.get(linha['titulo'])
+        resultados[indice] = LivroBulkResultado(
+            indice=indice,
+            status='criado' if livro_id else 'duplicado',
+            id=livro_id,
+        )
 
-    return db_livro
+    return LivroBulk(
+        criados=len(criados),
+        resultados=[resultados[indice] for indice in sorted(resultados)],
+    )
 
 
 @router.delete('/{livro_id}')
-def delete_livro(
+async def delete_livro(
     livro_id: int,
     session: T_Session,
+    cache: T_Cache,
     current_user: T_CurrentUser,
 ):
-    db_livro = session.scalar(select(Livro).where((Livro.id == livro_id)))
+    db_livro_id = await session.scalar(
+        delete(Livro)
+        .where((Livro.id == livro_id) & LIVRO_VISIVEL)
+        .returning(Livro.id)
+    )
 
-    if not db_livro:
+    if db_livro_id is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Livro não consta no MADR',
         )
 
-    session.delete(db_livro)
-    session.commit()
+    await session.commit()
+    await cache.delete(f'livro:{livro_id}')
 
     return {'message': 'Livro deletado no MADR'}
 
 
 @router.patch('/{livro_id}', response_model=LivroSchema)
-def update_livro(
+async def update_livro(
     livro_id: int,
     livro: LivroUpdate,
     session: T_Session,
+    cache: T_Cache,
     current_user: T_CurrentUser,
 ):
-    db_livro = session.scalar(select(Livro).where(Livro.id == livro_id))
+    valores = livro.model_dump(exclude_unset=True)
+    if 'titulo' in valores:
+        valores['titulo'] = sanitiza_nome(valores['titulo'])
 
-    if not db_livro:
+    # Um único UPDATE ... RETURNING: as constraints decidem o 409 (título
+    # repetido) e o 404 (romancista inexistente); romancistas marcados para
+    # a purga não recebem livros, e os livros deles não aceitam escritas
+    condicao = (Livro.id == livro_id) & LIVRO_VISIVEL
+    if 'romancista_id' in valores:
+        condicao &= (
+            select(Romancista.id)
+            .where(
+                (Romancista.id == valores['romancista_id'])
+                & ROMANCISTA_VISIVEL
+            )
+            .exists()
+        )
+    try:
+        db_livro = (
+            await session.execute(
+                update(Livro)
+                .where(condicao)
+                .values(**valores, versao=Livro.versao + 1)
+                .returning(Livro.ano, Livro.titulo, Livro.romancista_id)
+            )
+        ).one_or_none()
+    except IntegrityError as erro:
+        await session.rollback()
+        if isinstance(erro.orig, UniqueViolation):
+            raise HTTPException(
+                status_code=HTTPStatus.CONFLICT,
+                detail='livro já consta no MADR',
+            )
+        if isinstance(erro.orig, ForeignKeyViolation):
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='romancista não encontrado',
+            )
+        raise
+
+    if db_livro is None:
+        if 'romancista_id' in valores and await busca_livro(session, livro_id):
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='romancista não encontrado',
+            )
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Livro não consta no MADR',
         )
-    for field, value in livro.model_dump(exclude_unset=True).items():
-        if field == 'titulo':
-            sanitezed_value = sanitiza_nome(value)
-            title_exists = session.scalar(
-                select(Livro).where(
-                    (Livro.titulo == sanitezed_value) & (Livro.id != livro_id)
-                )
-            )
-            if title_exists:
-                raise HTTPException(
-                    status_code=HTTPStatus.CONFLICT,
-                    detail='livro já consta no MADR',
-                )
-            setattr(db_livro, field, sanitezed_value)
-        else:
-            setattr(db_livro, field, value)
 
-    session.add(db_livro)
-    session.commit()
-    session.refresh(db_livro)
+    await session.commit()
+    await cache.delete(f'livro:{livro_id}')
 
-    return db_livro
+    return db_livro._asdict()
+
+
+@router.get('/lote', response_model=LivroLote)
+async def get_livros_lote(
+    session: T_Session,
+    ids: Annotated[list[int], Query(min_length=1)],
+):
+    ids = valida_ids(ids, settings.BATCH_FETCH_MAX_IDS)
+    livros, nao_encontrados = await busca_por_ids(
+        session, COLUNAS_LIVRO, ids, LIVRO_VISIVEL
+    )
+
+    return {'livros': livros, 'nao_encontrados': nao_encontrados}
 
 
 @router.get('/{livro_id}', response_model=LivroPublic)
-def get_livro_by_id(
+async def get_livro_by_id(  # noqa: PLR0913, PLR0917
     livro_id: int,
+    request: Request,
+    response: Response,
     session: T_Session,
+    cache: T_Cache,
 ):
-    db_livro = session.scalar(select(Livro).where((Livro.id == livro_id)))
-    if not db_livro:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND,
-            detail='Livro não consta no MADR',
+    chave = f'livro:{livro_id}'
+    livro = await cache.get(chave)
+    if livro is not None and await cache.get(
+        f'romancista:{livro["romancista_id"]}:excluido'
+    ):
+        # Gravado antes de o romancista ser marcado para a purga
+        await cache.delete(chave)
+        livro = None
+    if livro is None:
+        db_livro = await busca_livro(session, livro_id)
+        if not db_livro:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='Livro não consta no MADR',
+            )
+
+        livro = db_livro._asdict()
+        await cache.set(chave, livro)
+
+    etag_livro = etag(livro['id'], livro['versao'])
+    if nao_modificado(request, etag_livro):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag_livro}
         )
+    response.headers['ETag'] = etag_livro
 
-    return db_livro
+    return livro
 
 
 @router.get('/', response_model=LivroList)
-def get_livros(  # noqa
+async def get_livros(  # noqa
+    request: Request,
     session: T_Session,
     params: T_Page,
     titulo: str | None = None,
     ano: int | None = None,
+    busca: Busca = 'parcial',
+    cursor: str | None = None,
+    count: Contagem = 'exact',
+    expand: Literal['romancista'] | None = None,
 ):
     # params = Params(size = 20)
-    query = select(Livro)
+    # Livros de romancistas excluídos somem antes mesmo da purga
+    query = select(Livro).where(LIVRO_VISIVEL)
     if titulo:
-        titulo_sanitizado = sanitiza_nome(titulo)
-        query = query.where(Livro.titulo.contains(titulo_sanitizado))
+        query = filtra_por_termo(query, Livro.titulo, titulo, busca)
 
     if ano:
         query = query.where(Livro.ano == ano)
 
-    paginated = paginate(session, query, params)
+    # Com expand a resposta depende também dos romancistas, que não entram
+    # na assinatura da coleção
+    total = None
+    headers = {}
+    if cursor is None and count == 'exact' and not expand:
+        etag_livros, total = await etag_colecao(
+            session, query, request.url.query
+        )
+        if nao_modificado(request, etag_livros):
+            return Response(
+                status_code=HTTPStatus.NOT_MODIFIED,
+                headers={'ETag': etag_livros},
+            )
+        headers['ETag'] = etag_livros
+
+    if expand:
+        query = query.options(selectinload(Livro.romancista))
+    else:
+        query = projeta_livros(query)
+
+    paginated = await paginar(
+        session,
+        query,
+        params,
+        Livro.id,
+        cursor,
+        por_relevancia=bool(titulo) and busca == 'relevancia',
+        count=count,
+        total=total,
+    )
+    if not expand:
+        return pagina_json(paginated, 'livros', headers)
+
     return LivroList(
         total=paginated.total,
         livros=[
-            LivroPublic(
-                id=i.id,
-                ano=i.ano,
-                titulo=i.titulo,
-                romancista_id=i.romancista_id,
-            )
+            LivroComRomancista.model_validate(i, from_attributes=True)
             for i in paginated.items
         ],
         page=paginated.page,
         size=paginated.size,
         pages=paginated.pages,
+        next_cursor=paginated.next_cursor,
     )
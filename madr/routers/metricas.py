@@ -0,0 +1,52 @@
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from madr.cache import ResponseCache, get_cache
+from madr.database import pool_status
+from madr.schemas import CacheStats, PoolStatus
+from madr.security import token_cache, user_cache
+from madr.settings import Settings
+
+settings = Settings()
+
+
+def metricas_habilitadas():
+    # Endpoints internos: só existem onde METRICS_ENABLED foi ligado (por
+    # exemplo, na instância que o coletor de métricas acessa pela rede
+    # interna); no resto respondem como uma rota inexistente
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Not Found'
+        )
+
+
+router = APIRouter(
+    prefix='/metricas',
+    tags=['metricas'],
+    include_in_schema=False,
+    dependencies=[Depends(metricas_habilitadas)],
+)
+
+
+@router.get('/pool', response_model=PoolStatus)
+async def read_pool_status():
+    return pool_status()
+
+
+@router.get('/cache/usuarios', response_model=CacheStats)
+async def read_user_cache_stats():
+    return user_cache.stats()
+
+
+@router.get('/cache/tokens', response_model=CacheStats)
+async def read_token_cache_stats():
+    return token_cache.stats()
+
+
+@router.get('/cache/respostas', response_model=CacheStats)
+async def read_response_cache_stats(
+    cache: Annotated[ResponseCache, Depends(get_cache)],
+):
+    return cache.stats()
@@ -1,143 +1,415 @@
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import JSONResponse
 from fastapi_pagination import Params
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import select
+from sqlalchemy import ARRAY, String, any_, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select, delete, select, update
 
-from madr.database import get_session
-from madr.models import Romancista, User
-from madr.schemas import RomancistaList, RomancistaPublic, RomancistaSchema
-from madr.security import get_current_user
-from madr.utils import get_params, sanitiza_nome
+from madr.cache import ResponseCache, get_cache
+from madr.consultas import (
+    COLUNAS_ROMANCISTA,
+    ROMANCISTA_VISIVEL,
+    busca_por_ids,
+    busca_romancista,
+    projeta_romancistas,
+)
+from madr.database import get_engine, get_session
+from madr.models import Romancista
+from madr.paginacao import Contagem, etag_colecao, pagina_json, paginar
+from madr.purga import executa_purga, nova_purga, status_purga
+from madr.schemas import (
+    PurgaStatus,
+    RomancistaBulk,
+    RomancistaComLivros,
+    RomancistaList,
+    RomancistaLote,
+    RomancistaPublic,
+    RomancistaSchema,
+    UserPublic,
+)
+from madr.security import get_current_principal
+from madr.settings import Settings
+from madr.utils import (
+    Busca,
+    etag,
+    filtra_por_termo,
+    get_params,
+    nao_modificado,
+    sanitiza_nome,
+    valida_ids,
+)
 
 router = APIRouter(prefix='/romancistas', tags=['romancistas'])
+settings = Settings()
 
-T_Session = Annotated[Session, Depends(get_session)]
-T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_Session = Annotated[AsyncSession, Depends(get_session)]
+T_CurrentUser = Annotated[UserPublic, Depends(get_current_principal)]
 T_Page = Annotated[Params, Depends(get_params)]
+T_Cache = Annotated[ResponseCache, Depends(get_cache)]
+T_Engine = Annotated[AsyncEngine, Depends(get_engine)]
 
 
 @router.post(
     '/', status_code=HTTPStatus.CREATED, response_model=RomancistaPublic
 )
-def create_romancista(
+async def create_romancista(
     romancista: RomancistaSchema,
     session: T_Session,
     current_user: T_CurrentUser,
 ):
-    nome_sanitizado = sanitiza_nome(romancista.nome)
-    db_romancista = session.scalar(
-        select(Romancista).where((Romancista.nome == nome_sanitizado))
-    )
+    db_romancista = (
+        await session.execute(
+            insert(Romancista)
+            .values(nome=sanitiza_nome(romancista.nome))
+            .on_conflict_do_nothing(index_elements=['nome'])
+            .returning(*COLUNAS_ROMANCISTA)
+        )
+    ).one_or_none()
 
-    if db_romancista:
+    if db_romancista is None:
+        await session.rollback()
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
             detail='romancista já consta no MADR',
         )
+    await session.commit()
+
+    return db_romancista._asdict()
+
 
-    db_romancista = Romancista(
-        nome=nome_sanitizado,
+def _busca_nomes(nomes: list[str]) -> Select:
+    # Os nomes vão num único array (= ANY): com IN seria um parâmetro por
+    # nome, e o protocolo do Postgres aceita no máximo 65535
+    return select(Romancista.nome, Romancista.id, Romancista.excluido).where(
+        Romancista.nome == any_(bindparam('nomes', nomes, ARRAY(String)))
     )
-    session.add(db_romancista)
-    session.commit()
-    session.refresh(db_romancista)
 
-    return db_romancista
+
+async def _resolve_nomes(
+    session: AsyncSession,
+    nomes: list[str],
+    ids: dict[str, int],
+    excluidos: set[str],
+):
+    # Romancistas marcados para a purga não são devolvidos: livros ligados
+    # a eles seriam recusados pelo /livros/bulk e apagados pela purga
+    for nome, romancista_id, excluido in await session.execute(
+        _busca_nomes(nomes)
+    ):
+        if excluido:
+            excluidos.add(nome)
+        else:
+            ids[nome] = romancista_id
+
+
+@router.post('/bulk', response_model=RomancistaBulk)
+async def create_romancistas_bulk(
+    romancistas: list[RomancistaSchema],
+    session: T_Session,
+    current_user: T_CurrentUser,
+):
+    if len(romancistas) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            detail=f'no máximo {settings.BULK_MAX_ITEMS} itens por lote',
+        )
+
+    nomes = list(dict.fromkeys(sanitiza_nome(r.nome) for r in romancistas))
+
+    ids, excluidos = {}, set()
+    await _resolve_nomes(session, nomes, ids, excluidos)
+
+    conhecidos = ids.keys() | excluidos
+    novos = [nome for nome in nomes if nome not in conhecidos]
+    criados = 0
+    for inicio in range(0, len(novos), settings.BULK_BATCH_SIZE):
+        lote = novos[inicio : inicio + settings.BULK_BATCH_SIZE]
+        inseridos = (
+            await session.execute(
+                insert(Romancista)
+                .values([{'nome': nome} for nome in lote])
+                .on_conflict_do_nothing(index_elements=['nome'])
+                .returning(Romancista.nome, Romancista.id)
+            )
+        ).all()
+        criados += len(inseridos)
+        ids.update(inseridos)
+
+    # Nomes inseridos por outra transação entre o SELECT e o INSERT
+    faltantes = [nome for nome in novos if nome not in ids]
+    if faltantes:
+        await _resolve_nomes(session, faltantes, ids, excluidos)
+    await session.commit()
+
+    return RomancistaBulk(
+        criados=criados,
+        romancistas={nome: ids[nome] for nome in nomes if nome in ids},
+        excluidos=[nome for nome in nomes if nome in excluidos],
+    )
+
+
+async def _marca_romancista_excluido(cache: ResponseCache, romancista_id: int):
+    # Os livros dele em cache não são apagados um a um (o catálogo de um
+    # autor pode ter milhões): a marca invalida cada um no próximo acesso.
+    # Ela dura o TTL do cache e é lida a cada acerto desses livros, então
+    # não sai do LRU antes das entradas que invalida
+    await cache.delete(f'romancista:{romancista_id}')
+    await cache.set(f'romancista:{romancista_id}:excluido', {'excluido': True})
 
 
 @router.delete('/{romancista_id}')
-def delete_romancista(
+async def delete_romancista(  # noqa: PLR0913, PLR0917
     romancista_id: int,
     session: T_Session,
+    cache: T_Cache,
+    engine: T_Engine,
+    background_tasks: BackgroundTasks,
     current_user: T_CurrentUser,
+    modo: Literal['imediato', 'lotes'] = 'imediato',
 ):
-    db_romancista = session.scalar(
-        select(Romancista).where(Romancista.id == romancista_id)
+    if modo == 'lotes':
+        return await _agenda_purga(
+            romancista_id, session, cache, engine, background_tasks
+        )
+
+    # Um único DELETE: os livros vão junto pelo ON DELETE CASCADE, e a
+    # marca no cache invalida os que estiverem lá
+    db_romancista_id = await session.scalar(
+        delete(Romancista)
+        .where(Romancista.id == romancista_id)
+        .returning(Romancista.id)
     )
-    if not db_romancista:
+    if db_romancista_id is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='romancista não encontrado',
         )
+    await session.commit()
+    await _marca_romancista_excluido(cache, romancista_id)
     return {'message': 'Romancista deletada no MADR'}
 
 
-@router.patch('/{romancista_id}', response_model=RomancistaPublic)
-def update_romancista(
+async def _agenda_purga(
     romancista_id: int,
-    romancista: RomancistaSchema,
-    session: T_Session,
-    current_user: T_CurrentUser,
-):
-    db_romancista = session.scalar(
-        select(Romancista).where(Romancista.id == romancista_id)
+    session: AsyncSession,
+    cache: ResponseCache,
+    engine: AsyncEngine,
+    background_tasks: BackgroundTasks,
+) -> JSONResponse:
+    # Esconde o romancista (e os livros dele) na hora; a purga apaga os
+    # livros em lotes depois que a resposta é enviada
+    db_romancista_id = await session.scalar(
+        update(Romancista)
+        .where(Romancista.id == romancista_id)
+        .values(excluido=True, versao=Romancista.versao + 1)
+        .returning(Romancista.id)
     )
-
-    if not db_romancista:
+    if db_romancista_id is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='romancista não encontrado',
         )
+    await session.commit()
+    await _marca_romancista_excluido(cache, romancista_id)
 
-    nome_sanitizado = sanitiza_nome(romancista.nome)
+    purga = nova_purga(romancista_id)
+    background_tasks.add_task(executa_purga, engine, cache, purga)
 
-    db_romancista_nome = session.scalar(
-        select(Romancista).where(Romancista.nome == nome_sanitizado)
+    return JSONResponse(
+        status_purga(purga.id),
+        status_code=HTTPStatus.ACCEPTED,
+        headers={'Location': f'/romancistas/purgas/{purga.id}'},
     )
-    if db_romancista_nome:
+
+
+@router.get('/purgas/{purga_id}', response_model=PurgaStatus)
+async def read_purga(purga_id: str):
+    purga = status_purga(purga_id)
+    if purga is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='purga não encontrada',
+        )
+
+    return purga
+
+
+@router.patch('/{romancista_id}', response_model=RomancistaPublic)
+async def update_romancista(
+    romancista_id: int,
+    romancista: RomancistaSchema,
+    session: T_Session,
+    cache: T_Cache,
+    current_user: T_CurrentUser,
+):
+    nome_sanitizado = sanitiza_nome(romancista.nome)
+
+    # Um único UPDATE ... RETURNING; repetir o próprio nome também é
+    # conflito, por isso o filtro em `nome`
+    try:
+        db_romancista = (
+            await session.execute(
+                update(Romancista)
+                .where(
+                    (Romancista.id == romancista_id)
+                    & (Romancista.nome != nome_sanitizado)
+                    & ROMANCISTA_VISIVEL
+                )
+                .values(nome=nome_sanitizado, versao=Romancista.versao + 1)
+                .returning(*COLUNAS_ROMANCISTA)
+            )
+        ).one_or_none()
+    except IntegrityError:
+        await session.rollback()
+        db_romancista = None
+
+    if db_romancista is None:
+        # Só no caminho de erro: distingue o 404 do 409
+        existe = await session.scalar(
+            select(Romancista.id).where(
+                (Romancista.id == romancista_id) & ROMANCISTA_VISIVEL
+            )
+        )
+        if not existe:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='romancista não encontrado',
+            )
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
             detail='romancista já consta no MADR',
         )
 
-    setattr(db_romancista, 'nome', nome_sanitizado)
+    await session.commit()
+    await cache.delete(f'romancista:{romancista_id}')
 
-    session.add(db_romancista)
-    session.commit()
-    session.refresh(db_romancista)
+    return db_romancista._asdict()
 
-    return db_romancista
 
+@router.get('/lote', response_model=RomancistaLote)
+async def get_romancistas_lote(
+    session: T_Session,
+    ids: Annotated[list[int], Query(min_length=1)],
+):
+    ids = valida_ids(ids, settings.BATCH_FETCH_MAX_IDS)
+    romancistas, nao_encontrados = await busca_por_ids(
+        session, COLUNAS_ROMANCISTA, ids, ROMANCISTA_VISIVEL
+    )
 
-@router.get('/{romancista_id}', response_model=RomancistaPublic)
-def read_romancista_by_id(romancista_id: int, session: T_Session):
-    db_romancista = session.scalar(
-        select(Romancista).where(Romancista.id == romancista_id)
+    return {'romancistas': romancistas, 'nao_encontrados': nao_encontrados}
+
+
+@router.get(
+    '/{romancista_id}',
+    response_model=RomancistaComLivros | RomancistaPublic,
+)
+async def read_romancista_by_id(  # noqa: PLR0913, PLR0917
+    romancista_id: int,
+    request: Request,
+    response: Response,
+    session: T_Session,
+    cache: T_Cache,
+    expand: Literal['livros'] | None = None,
+):
+    if expand:
+        return await _read_romancista_com_livros(session, romancista_id)
+
+    chave = f'romancista:{romancista_id}'
+    romancista = await cache.get(chave)
+    if romancista is None:
+        db_romancista = await busca_romancista(session, romancista_id)
+        if not db_romancista:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='romancista não encontrado',
+            )
+
+        romancista = db_romancista._asdict()
+        await cache.set(chave, romancista)
+
+    etag_romancista = etag(romancista['id'], romancista['versao'])
+    if nao_modificado(request, etag_romancista):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={'ETag': etag_romancista},
+        )
+    response.headers['ETag'] = etag_romancista
+
+    return romancista
+
+
+async def _read_romancista_com_livros(
+    session: AsyncSession, romancista_id: int
+) -> RomancistaComLivros:
+    db_romancista = await session.scalar(
+        select(Romancista)
+        .where((Romancista.id == romancista_id) & ROMANCISTA_VISIVEL)
+        .options(selectinload(Romancista.livros))
     )
     if not db_romancista:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='romancista não encontrado',
         )
-    return db_romancista
+
+    return RomancistaComLivros.model_validate(
+        db_romancista, from_attributes=True
+    )
 
 
 @router.get('/', response_model=RomancistaList)
-def read_romancistas(
+async def read_romancistas(  # noqa
+    request: Request,
     session: T_Session,
     params: T_Page,
     nome: str,
+    busca: Busca = 'parcial',
+    cursor: str | None = None,
+    count: Contagem = 'exact',
 ):
-    query = select(Romancista).where(
-        Romancista.nome.contains(sanitiza_nome(nome))
+    query = filtra_por_termo(
+        select(Romancista).where(ROMANCISTA_VISIVEL),
+        Romancista.nome,
+        nome,
+        busca,
     )
 
-    paginated = paginate(session, query, params)
-
-    return RomancistaList(
-        total=paginated.total,
-        romancistas=[
-            RomancistaPublic(
-                id=i.id,
-                nome=i.nome,
+    total = None
+    headers = {}
+    if cursor is None and count == 'exact':
+        etag_romancistas, total = await etag_colecao(
+            session, query, request.url.query
+        )
+        if nao_modificado(request, etag_romancistas):
+            return Response(
+                status_code=HTTPStatus.NOT_MODIFIED,
+                headers={'ETag': etag_romancistas},
             )
-            for i in paginated.items
-        ],
-        page=paginated.page,
-        size=paginated.size,
-        pages=paginated.pages,
+        headers['ETag'] = etag_romancistas
+
+    paginated = await paginar(
+        session,
+        projeta_romancistas(query),
+        params,
+        Romancista.id,
+        cursor,
+        por_relevancia=busca == 'relevancia',
+        count=count,
+        total=total,
     )
+
+    return pagina_json(paginated, 'romancistas', headers)
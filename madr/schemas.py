@@ -1,4 +1,4 @@
-from typing import Sequence, TypeVar
+from typing import Literal, Sequence, TypeVar
 
 from pydantic import BaseModel, EmailStr
 
@@ -42,11 +42,30 @@ class LivroUpdate(BaseModel):
 
 
 class LivroList(BaseModel):
-    total: int
-    livros: Sequence[LivroPublic]
-    page: int
+    total: int | None
+    livros: Sequence['LivroComRomancista | LivroPublic']
+    page: int | None
     size: int
-    pages: int
+    pages: int | None
+    next_cursor: str | None = None
+
+
+class LivroLote(BaseModel):
+    livros: Sequence[LivroPublic]
+    nao_encontrados: Sequence[int]
+
+
+class LivroBulkResultado(BaseModel):
+    indice: int
+    status: Literal[
+        'criado', 'duplicado', 'romancista_nao_encontrado', 'invalido'
+    ]
+    id: int | None = None
+
+
+class LivroBulk(BaseModel):
+    criados: int
+    resultados: Sequence[LivroBulkResultado]
 
 
 class RomancistaSchema(BaseModel):
@@ -58,9 +77,60 @@ class RomancistaPublic(BaseModel):
     nome: str
 
 
+class LivroComRomancista(LivroPublic):
+    romancista: RomancistaPublic
+
+
+class RomancistaComLivros(RomancistaPublic):
+    livros: Sequence[LivroPublic]
+
+
+class RomancistaBulk(BaseModel):
+    criados: int
+    romancistas: dict[str, int]
+    # Nomes de romancistas marcados para a purga, sem id a devolver
+    excluidos: Sequence[str] = ()
+
+
+class RomancistaLote(BaseModel):
+    romancistas: Sequence[RomancistaPublic]
+    nao_encontrados: Sequence[int]
+
+
 class RomancistaList(BaseModel):
-    total: int
+    total: int | None
     romancistas: Sequence[RomancistaPublic]
-    page: int
+    page: int | None
+    size: int
+    pages: int | None
+    next_cursor: str | None = None
+
+
+class PurgaStatus(BaseModel):
+    id: str
+    romancista_id: int
+    status: Literal['pendente', 'executando', 'concluida', 'falhou']
+    livros_apagados: int
+    erro: str | None = None
+
+
+class PoolStatus(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    connects: int
+    checkouts: int
+    timeouts: int
+    wait_count: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+class CacheStats(BaseModel):
     size: int
-    pages: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
@@ -1,22 +1,57 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from hashlib import sha256
 from http import HTTPStatus
+from time import time
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jwt import decode, encode
 from jwt.exceptions import ExpiredSignatureError, PyJWTError
 from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
+from pwdlib.hashers.argon2 import Argon2Hasher
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from sqlalchemy.sql import select
 from zoneinfo import ZoneInfo
 
+from madr.cache import TTLCache
 from madr.database import get_session
 from madr.models import User
+from madr.schemas import UserPublic
 from madr.settings import Settings
 
-pwd_context = PasswordHash.recommended()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
 settings = Settings()
+pwd_context = PasswordHash((
+    Argon2Hasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST,
+        parallelism=settings.ARGON2_PARALLELISM,
+    ),
+))
+
+_revalidated_users = TTLCache(
+    max_size=settings.AUTH_REVALIDATION_MAX_SIZE,
+    ttl=settings.AUTH_REVALIDATION_TTL_SECONDS,
+)
+user_cache = TTLCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+token_cache = TTLCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+_hash_executor: Executor | None = None
+_hash_pending = 0
 
 
 def get_password_hash(password: str) -> str:
@@ -27,6 +62,80 @@ def verify_password(password: str, hash_password: str) -> bool:
     return pwd_context.verify(password, hash_password)
 
 
+def verify_and_update_password(
+    password: str, hash_password: str
+) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, hash_password)
+
+
+def get_hash_executor() -> Executor:
+    global _hash_executor  # noqa: PLW0603
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == 'process':
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix='password-hash',
+            )
+    return _hash_executor
+
+
+def _discard_hash_executor(executor: Executor):
+    global _hash_executor  # noqa: PLW0603
+    if _hash_executor is executor:
+        _hash_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_hash_executor():
+    # Chamado no fim do lifespan da aplicação: encerra os workers do pool
+    if _hash_executor is not None:
+        _discard_hash_executor(_hash_executor)
+
+
+async def _run_in_hash_executor(func, *args):
+    global _hash_pending  # noqa: PLW0603
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Serviço sobrecarregado, tente novamente',
+            headers={'Retry-After': '1'},
+        )
+
+    _hash_pending += 1
+    executor = get_hash_executor()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        # Um worker morreu (OOM, kill) e o pool não aceita mais tarefas: a
+        # próxima chamada cria outro
+        _discard_hash_executor(executor)
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Serviço sobrecarregado, tente novamente',
+            headers={'Retry-After': '1'},
+        )
+    finally:
+        _hash_pending -= 1
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_executor(get_password_hash, password)
+
+
+async def verify_and_update_password_async(
+    password: str, hash_password: str
+) -> tuple[bool, str | None]:
+    return await _run_in_hash_executor(
+        verify_and_update_password, password, hash_password
+    )
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
 
@@ -42,33 +151,135 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def get_current_user(
-    session: Session = Depends(get_session),
-    token: str = Depends(oauth2_scheme),
-):
-    credentials_exception = HTTPException(
+def user_claims(user: User) -> dict:
+    return {'sub': user.email, 'uid': user.id, 'username': user.username}
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail='Não autorizado',
         headers={'WWW-Authenticate': 'Bearer'},
     )
+
+
+def decode_access_token(token: str) -> dict:
+    if settings.TOKEN_CACHE_ENABLED:
+        key = sha256(token.encode()).digest()
+        payload = token_cache.get(key)
+        if payload is not None and payload['exp'] > time():
+            return payload
+
+    payload = _verify_token(token)
+
+    if settings.TOKEN_CACHE_ENABLED and 'exp' in payload:
+        token_cache.set(key, payload)
+
+    return payload
+
+
+def _verify_token(token: str) -> dict:
     try:
         payload = decode(
             token,
             settings.SECRET_KEY,
             algorithms=[settings.ALGORITHM],
         )
-        email = payload.get('sub')
-        if not email:
-            raise credentials_exception
+        if not payload.get('sub'):
+            raise _credentials_exception()
     except ExpiredSignatureError:
-        raise credentials_exception
+        raise _credentials_exception()
 
     except PyJWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    return payload
+
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    email = decode_access_token(token)['sub']
+    return await _load_user(session, email)
+
 
-    user = session.scalar(select(User).where(User.email == email))
+async def _load_user(session: AsyncSession, email: str) -> User:
+    if settings.USER_CACHE_ENABLED:
+        snapshot = user_cache.get(email)
+        if snapshot is not None:
+            return _attach_user_snapshot(session, snapshot)
+
+    user = await session.scalar(select(User).where(User.email == email))
 
     if not user:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    if settings.USER_CACHE_ENABLED:
+        user_cache.set(
+            email,
+            {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'password': user.password,
+            },
+        )
+
+    return user
+
+
+def _attach_user_snapshot(session: AsyncSession, snapshot: dict) -> User:
+    # Reconstrói a conta como persistente sem consultar o banco, para que
+    # update_user e delete_user continuem operando sobre ela
+    user = User(
+        username=snapshot['username'],
+        email=snapshot['email'],
+        password=snapshot['password'],
+    )
+    user.id = snapshot['id']
+    make_transient_to_detached(user)
+    session.add(user)
 
     return user
+
+
+async def get_current_principal(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+) -> UserPublic:
+    payload = decode_access_token(token)
+    user_id, email = payload.get('uid'), payload['sub']
+    username = payload.get('username')
+
+    if not settings.STATELESS_AUTH or user_id is None or username is None:
+        user = await _load_user(session, email)
+        return UserPublic(id=user.id, email=user.email, username=user.username)
+
+    # Confia nas claims assinadas e só revalida a conta depois do TTL. O
+    # username também vem das claims: um token emitido antes de trocá-lo
+    # deixa de valer, como acontece com o email
+    if _revalidated_users.get(user_id) != (email, username):
+        user_exists = await session.scalar(
+            select(User.id).where(
+                (User.id == user_id)
+                & (User.email == email)
+                & (User.username == username)
+            )
+        )
+        if not user_exists:
+            raise _credentials_exception()
+        _revalidated_users.set(user_id, (email, username))
+
+    return UserPublic(id=user_id, email=email, username=username)
+
+
+def revoke_user(user_id: int, email: str):
+    _revalidated_users.delete(user_id)
+    user_cache.delete(email)
+
+
+def clear_auth_caches():
+    _revalidated_users.clear()
+    user_cache.clear()
+    token_cache.clear()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,3 +13,34 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    DATABASE_POOL_RECYCLE: int = -1
+    DATABASE_POOL_PRE_PING: bool = False
+    DATABASE_POOL_USE_LIFO: bool = False
+    PASSWORD_HASH_EXECUTOR: Literal['process', 'thread'] = 'process'
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    STATELESS_AUTH: bool = False
+    AUTH_REVALIDATION_TTL_SECONDS: float = 30.0
+    AUTH_REVALIDATION_MAX_SIZE: int = 10_000
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_SIZE: int = 1024
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAX_SIZE: int = 4096
+    BULK_BATCH_SIZE: int = 1000
+    BULK_MAX_ITEMS: int = 100_000
+    EXPORT_BATCH_SIZE: int = 1000
+    BATCH_FETCH_MAX_IDS: int = 100
+    PURGE_BATCH_SIZE: int = 1000
+    PURGE_JOBS_MAX_SIZE: int = 1000
+    PURGE_JOBS_TTL_SECONDS: float = 3600.0
+    RESPONSE_CACHE_MAX_SIZE: int = 10_000
+    RESPONSE_CACHE_TTL_SECONDS: float = 300.0
+    RESPONSE_CACHE_INVALIDATION_SECONDS: float = 5.0
+    METRICS_ENABLED: bool = False
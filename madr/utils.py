@@ -1,6 +1,15 @@
+import json
 import re
+from http import HTTPStatus
+from typing import Any, Literal
 
+from fastapi import HTTPException, Request
 from fastapi_pagination import Params
+from sqlalchemy import func
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+Busca = Literal['parcial', 'relevancia']
 
 
 def sanitiza_nome(nome: str) -> str:
@@ -11,3 +20,80 @@ def sanitiza_nome(nome: str) -> str:
 
 def get_params(size: int = 20):
     return Params(size=size)
+
+
+def filtra_por_termo(
+    query: Select, coluna: ColumnElement, termo: str, busca: Busca
+) -> Select:
+    termo = sanitiza_nome(termo)
+    if busca == 'relevancia':
+        return query.where(
+            coluna.contains(termo) | coluna.op('%')(termo)
+        ).order_by(
+            func.similarity(coluna, termo).desc(),
+            # Desempate estável: com LIMIT/OFFSET, scores iguais sem ordem
+            # definida repetiriam ou pulariam linhas entre páginas
+            coluna.class_.id,
+        )
+
+    return query.where(coluna.contains(termo))
+
+
+def _ler_linha(linha: bytes) -> Any:
+    try:
+        return json.loads(linha)
+    except ValueError:
+        # Nenhum schema aceita None: o item é marcado como inválido
+        return None
+
+
+async def ler_lote(request: Request) -> list[Any]:
+    corpo = await request.body()
+    content_type = request.headers.get('content-type', '')
+
+    if content_type.startswith('application/x-ndjson'):
+        # Cada linha é um documento: uma linha malformada vira um item
+        # inválido na sua posição, sem derrubar o lote inteiro
+        itens = [
+            _ler_linha(linha) for linha in corpo.splitlines() if linha.strip()
+        ]
+    else:
+        try:
+            itens = json.loads(corpo)
+        except ValueError:
+            itens = None
+
+    if not isinstance(itens, list):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail='lote deve ser um array JSON ou NDJSON',
+        )
+
+    return itens
+
+
+def valida_ids(ids: list[int], limite: int) -> list[int]:
+    # Remove repetidos mantendo a ordem pedida
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > limite:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f'no máximo {limite} ids por requisição',
+        )
+
+    return ids
+
+
+def etag(*partes) -> str:
+    return '"' + '-'.join(str(parte) for parte in partes) + '"'
+
+
+def nao_modificado(request: Request, etag_atual: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+
+    etags = {
+        valor.strip().removeprefix('W/') for valor in if_none_match.split(',')
+    }
+    return '*' in etags or etag_atual in etags
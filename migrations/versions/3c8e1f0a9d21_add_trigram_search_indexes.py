@@ -0,0 +1,59 @@
+"""add trigram search indexes
+
+Revision ID: 3c8e1f0a9d21
+Revises: 101f2a985795
+Create Date: 2026-10-18 09:12:40.118245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1f0a9d21'
+down_revision: Union[str, None] = '101f2a985795'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY não roda dentro de transação e não bloqueia escritas
+    # enquanto os índices são construídos
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_livros_titulo_trgm',
+            'livros',
+            ['titulo'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'titulo': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_romancistas_nome_trgm',
+            'romancistas',
+            ['nome'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'nome': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_romancistas_nome_trgm',
+            table_name='romancistas',
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_livros_titulo_trgm',
+            table_name='livros',
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,28 @@
+"""add versao to livros and romancistas
+
+Revision ID: 5b2d7e4c1f08
+Revises: 3c8e1f0a9d21
+Create Date: 2026-10-18 14:03:11.504812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2d7e4c1f08'
+down_revision: Union[str, None] = '3c8e1f0a9d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('livros', sa.Column('versao', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('romancistas', sa.Column('versao', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('romancistas', 'versao')
+    op.drop_column('livros', 'versao')
@@ -0,0 +1,34 @@
+"""cascade livros on romancista delete
+
+Revision ID: 8e4a6c2d9b13
+Revises: 5b2d7e4c1f08
+Create Date: 2026-10-18 16:22:47.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4a6c2d9b13'
+down_revision: Union[str, None] = '5b2d7e4c1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_constraint('livros_romancista_id_fkey', 'livros', type_='foreignkey')
+    op.create_foreign_key(
+        'livros_romancista_id_fkey', 'livros', 'romancistas',
+        ['romancista_id'], ['id'], ondelete='CASCADE',
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('livros_romancista_id_fkey', 'livros', type_='foreignkey')
+    op.create_foreign_key(
+        'livros_romancista_id_fkey', 'livros', 'romancistas',
+        ['romancista_id'], ['id'],
+    )
@@ -0,0 +1,26 @@
+"""add excluido to romancistas
+
+Revision ID: c7f1a3e5d2b9
+Revises: 8e4a6c2d9b13
+Create Date: 2026-10-18 17:05:12.640981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f1a3e5d2b9'
+down_revision: Union[str, None] = '8e4a6c2d9b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('romancistas', sa.Column('excluido', sa.Boolean(), server_default='false', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('romancistas', 'excluido')
@@ -0,0 +1,53 @@
+"""add livros ano and romancista indexes
+
+Revision ID: e2b9d4f6a817
+Revises: c7f1a3e5d2b9
+Create Date: 2026-10-18 17:48:30.112574
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9d4f6a817'
+down_revision: Union[str, None] = 'c7f1a3e5d2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY não roda dentro de transação e não bloqueia escritas em
+    # `livros` enquanto o índice é construído. Sem IF NOT EXISTS: um build
+    # que falhou deixa o índice INVALID, e a migração deve falhar também
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_livros_ano_id',
+            'livros',
+            ['ano', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_livros_romancista_id_id',
+            'livros',
+            ['romancista_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_livros_romancista_id_id',
+            table_name='livros',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_livros_ano_id',
+            table_name='livros',
+            postgresql_concurrently=True,
+        )
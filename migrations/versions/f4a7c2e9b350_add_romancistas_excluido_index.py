@@ -0,0 +1,41 @@
+"""add romancistas excluido index
+
+Revision ID: f4a7c2e9b350
+Revises: e2b9d4f6a817
+Create Date: 2026-10-18 21:05:12.406318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a7c2e9b350'
+down_revision: Union[str, None] = 'e2b9d4f6a817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Índice parcial: só os romancistas marcados para a purga
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_romancistas_excluido',
+            'romancistas',
+            ['id'],
+            unique=False,
+            postgresql_where=sa.text('excluido'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_romancistas_excluido',
+            table_name='romancistas',
+            postgresql_where=sa.text('excluido'),
+            postgresql_concurrently=True,
+        )
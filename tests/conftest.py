@@ -2,13 +2,18 @@ import factory
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 from testcontainers.postgres import PostgresContainer
 
+from madr import security
 from madr.app import app
-from madr.database import get_session
+from madr.cache import LRUResponseCache, get_cache
+from madr.database import get_engine, get_session
 from madr.models import Livro, Romancista, User, table_registry
-from madr.security import get_password_hash
+from madr.routers import metricas
+from madr.security import clear_auth_caches, get_password_hash
 
 
 class UserFactory(factory.Factory):
@@ -36,16 +41,36 @@ class LivroFactory(factory.Factory):
     romancista_id = 1
 
 
+@pytest.fixture(autouse=True)
+def _hash_em_threads(monkeypatch):
+    # O lifespan de cada client encerra o pool de hash; recriar processos
+    # (spawn) a cada teste custaria mais que os próprios testes
+    monkeypatch.setattr(security.settings, 'PASSWORD_HASH_EXECUTOR', 'thread')
+
+
 @pytest.fixture
-def client(session):
-    def get_session_override():
-        yield session
+def _metricas_habilitadas(monkeypatch):
+    monkeypatch.setattr(metricas.settings, 'METRICS_ENABLED', True)
+
+
+@pytest.fixture
+def client(session, async_engine):
+    response_cache = LRUResponseCache(max_size=100, ttl=60)
+
+    async def get_session_override():
+        async with AsyncSession(
+            async_engine, expire_on_commit=False
+        ) as async_session:
+            yield async_session
 
     with TestClient(app) as client:
         app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_engine] = lambda: async_engine
+        app.dependency_overrides[get_cache] = lambda: response_cache
         yield client
 
     app.dependency_overrides.clear()
+    clear_auth_caches()
 
 
 @pytest.fixture(scope='session')
@@ -57,6 +82,13 @@ def engine():
             yield _engine
 
 
+@pytest.fixture(scope='session')
+def async_engine(engine):
+    # O TestClient roda cada teste em um event loop próprio; sem pool, as
+    # conexões assíncronas não ficam presas a um loop já encerrado.
+    return create_async_engine(engine.url, poolclass=NullPool)
+
+
 @pytest.fixture
 def session(engine):
     table_registry.metadata.create_all(engine)
@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.consultas import (
+    COLUNAS_LIVRO,
+    LIVRO_VISIVEL,
+    busca_livro,
+    busca_por_ids,
+)
+
+
+async def _busca_livro(async_engine, livro_id):
+    async with AsyncSession(async_engine) as session:
+        linha = await busca_livro(session, livro_id)
+        return linha, len(session.identity_map)
+
+
+async def _busca_por_ids(async_engine, ids):
+    async with AsyncSession(async_engine) as session:
+        return await busca_por_ids(session, COLUNAS_LIVRO, ids, LIVRO_VISIVEL)
+
+
+def test_busca_livro_nao_hidrata_entidade(async_engine, romancista, livro):
+    linha, entidades = asyncio.run(_busca_livro(async_engine, livro.id))
+
+    assert linha._asdict() == {
+        'id': livro.id,
+        'ano': livro.ano,
+        'titulo': livro.titulo,
+        'romancista_id': livro.romancista_id,
+        'versao': livro.versao,
+    }
+    assert entidades == 0
+
+
+def test_busca_livro_inexistente(session, async_engine):
+    linha, _ = asyncio.run(_busca_livro(async_engine, 999))
+
+    assert linha is None
+
+
+def test_busca_por_ids(async_engine, romancista, livro, other_livro):
+    itens, faltando = asyncio.run(
+        _busca_por_ids(async_engine, [other_livro.id, 999, livro.id])
+    )
+
+    assert [i['id'] for i in itens] == [other_livro.id, livro.id]
+    assert faltando == [999]
@@ -1,6 +1,12 @@
 from http import HTTPStatus
 
 import pytest
+from pwdlib.hashers.argon2 import Argon2Hasher
+from sqlalchemy import delete
+
+from madr.models import User
+from madr.security import pwd_context, verify_password
+from tests.conftest import UserFactory
 
 
 def test_create_user(client):
@@ -96,6 +102,25 @@ def test_update_user(client, user, token):
     }
 
 
+def test_update_user_invalida_token_do_email_antigo(client, user, token):
+    client.put(
+        f'/user/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'email': 'new_email@email.com',
+            'username': 'new_username',
+            'password': 'new_password',
+        },
+    )
+
+    response = client.delete(
+        f'/user/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
 def test_update_user_password(client, user, token):
     response = client.put(
         f'/user/{user.id}',
@@ -199,3 +224,46 @@ def test_refresh_token(client, token):
     assert 'access_token' in data
     assert 'token_type' in data
     assert data['token_type'] == 'bearer'
+
+
+def test_get_token_rehashes_outdated_password(client, session):
+    pwd = 'testest'
+    outdated = Argon2Hasher(time_cost=1, memory_cost=8192, parallelism=1)
+    user = UserFactory(password=outdated.hash(pwd))
+    session.add(user)
+    session.commit()
+    old_hash = user.password
+
+    response = client.post(
+        '/token',
+        data={'username': user.email, 'password': pwd},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    session.refresh(user)
+    assert user.password != old_hash
+    assert not pwd_context.current_hasher.check_needs_rehash(user.password)
+    assert verify_password(pwd, user.password)
+
+
+@pytest.mark.parametrize('metodo', ['put', 'delete'])
+def test_conta_apagada_em_outro_worker(session, client, user, token, metodo):
+    headers = {'Authorization': f'Bearer {token}'}
+    # Deixa a conta no cache de usuários e apaga a linha por fora da API
+    client.post('/refresh-token', headers=headers)
+    session.execute(delete(User).where(User.id == user.id))
+    session.commit()
+
+    response = client.request(
+        metodo,
+        f'/user/{user.id}',
+        headers=headers,
+        json={
+            'email': 'new_email@email.com',
+            'username': 'new_username',
+            'password': 'new_password',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json() == {'detail': 'Não autorizado'}
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+
+from tests.conftest import LivroFactory
+
+
+def test_export_livros_ndjson(session, client, romancista):
+    total_livros = 5
+    session.bulk_save_objects(LivroFactory.create_batch(size=total_livros))
+    session.commit()
+
+    response = client.get('/export/livros')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert len(linhas) == total_livros
+    assert linhas[0]['romancista'] == romancista.nome
+    assert set(linhas[0]) == {
+        'id',
+        'titulo',
+        'ano',
+        'romancista_id',
+        'romancista',
+    }
+
+
+def test_export_livros_csv(session, client, romancista, livro):
+    response = client.get('/export/livros?formato=csv')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/csv')
+    linhas = list(csv.DictReader(io.StringIO(response.text)))
+    assert linhas == [
+        {
+            'id': str(livro.id),
+            'titulo': livro.titulo,
+            'ano': str(livro.ano),
+            'romancista_id': str(romancista.id),
+            'romancista': romancista.nome,
+        }
+    ]
+
+
+def test_export_livros_vazio(client):
+    response = client.get('/export/livros?formato=csv')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.text.splitlines() == [
+        'id,titulo,ano,romancista_id,romancista'
+    ]
@@ -1,9 +1,15 @@
+import asyncio
+import json
 from http import HTTPStatus
 
 import pytest
+from httpx import ASGITransport, AsyncClient
 
+from madr import consultas
+from madr.routers import livros
+from madr.schemas import LivroList, LivroPublic
 from madr.utils import sanitiza_nome
-from tests.conftest import LivroFactory
+from tests.conftest import LivroFactory, RomancistaFactory
 
 
 def test_add_livro(client, token, romancista):
@@ -56,6 +62,27 @@ def test_add_livro_already_exists(client, token, romancista, livro):
     assert response.json() == {'detail': 'livro já consta no MADR'}
 
 
+def test_add_livro_titulo_existente_em_outro_romancista(
+    session, client, token, romancista, livro
+):
+    outro_romancista = RomancistaFactory()
+    session.add(outro_romancista)
+    session.commit()
+
+    response = client.post(
+        '/livros/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'titulo': livro.titulo,
+            'ano': livro.ano,
+            'romancista_id': outro_romancista.id,
+        },
+    )
+
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json() == {'detail': 'livro já consta no MADR'}
+
+
 def test_add_livro_without_token(client):
     response = client.post(
         '/livros/',
@@ -146,6 +173,99 @@ def test_patch_livro_romancista_id(client, token, romancista, livro):
     }
 
 
+def test_patch_livro_romancista_id_not_found(client, token, romancista, livro):
+    response = client.patch(
+        f'/livros/{livro.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'romancista_id': 999},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'romancista não encontrado'}
+
+
+@pytest.fixture
+def romancista_excluido(session):
+    romancista = RomancistaFactory()
+    romancista.excluido = True
+    session.add(romancista)
+    session.commit()
+    session.refresh(romancista)
+
+    return romancista
+
+
+def test_add_livro_com_romancista_excluido(client, token, romancista_excluido):
+    response = client.post(
+        '/livros/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'titulo': 'Dom Casmurro',
+            'ano': 1899,
+            'romancista_id': romancista_excluido.id,
+        },
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'romancista não encontrado'}
+
+
+def test_create_livros_bulk_com_romancista_excluido(
+    client, token, romancista_excluido
+):
+    response = client.post(
+        '/livros/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {
+                'titulo': 'Dom Casmurro',
+                'ano': 1899,
+                'romancista_id': romancista_excluido.id,
+            }
+        ],
+    )
+
+    assert response.json()['criados'] == 0
+    assert response.json()['resultados'][0]['status'] == (
+        'romancista_nao_encontrado'
+    )
+
+
+def test_patch_livro_romancista_id_excluido(
+    client, token, romancista, livro, romancista_excluido
+):
+    response = client.patch(
+        f'/livros/{livro.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'romancista_id': romancista_excluido.id},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'romancista não encontrado'}
+    assert client.get(f'/livros/{livro.id}').json()['romancista_id'] == (
+        romancista.id
+    )
+
+
+@pytest.mark.parametrize('metodo', ['patch', 'delete'])
+def test_livro_de_romancista_excluido_nao_aceita_escrita(
+    session, client, token, romancista_excluido, metodo
+):
+    livro = LivroFactory(romancista_id=romancista_excluido.id)
+    session.add(livro)
+    session.commit()
+
+    response = client.request(
+        metodo,
+        f'/livros/{livro.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 2000} if metodo == 'patch' else None,
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Livro não consta no MADR'}
+
+
 def test_patch_livro_doesnot_exist(client, token, romancista, livro):
     response = client.patch(
         '/livros/999',
@@ -286,3 +406,364 @@ def test_get_livro_without_token(client, romancista, livro):
 
     assert response.status_code == HTTPStatus.OK
     assert response.json()['livros'][0]['titulo'] == livro.titulo
+
+
+def test_get_livros_busca_relevancia(session, client, romancista):
+    session.add_all([
+        LivroFactory(titulo='memórias póstumas de brás cubas'),
+        LivroFactory(titulo='memórias de um sargento de milícias'),
+        LivroFactory(titulo='o cortiço'),
+    ])
+    session.commit()
+
+    response = client.get('/livros/?titulo=memórias póstumas&busca=relevancia')
+
+    assert response.status_code == HTTPStatus.OK
+    titulos = [livro['titulo'] for livro in response.json()['livros']]
+    assert titulos[0] == 'memórias póstumas de brás cubas'
+    assert 'o cortiço' not in titulos
+
+
+def test_get_livros_busca_relevancia_desempata_por_id(
+    session, client, romancista
+):
+    # Mesmo score para todos: a ordem vem só do desempate por id
+    livros_db = [
+        LivroFactory(titulo=f'dom casmurro {letra}') for letra in 'zyxwv'
+    ]
+    session.add_all(livros_db)
+    session.commit()
+    # Um UPDATE move a linha para o fim da tabela, fora da ordem de id
+    livros_db[0].ano = 1899
+    session.commit()
+
+    response = client.get('/livros/?titulo=dom casmurro&busca=relevancia')
+
+    ids = [livro['id'] for livro in response.json()['livros']]
+    assert ids == sorted(ids)
+
+
+def test_get_livros_cursor_crawls_whole_catalog(session, client, romancista):
+    total_livros = 45
+    session.bulk_save_objects(
+        LivroFactory.create_batch(size=total_livros, ano=2024)
+    )
+    session.commit()
+
+    response = client.get('/livros/?ano=2024')
+    ids = [livro['id'] for livro in response.json()['livros']]
+    cursor = response.json()['next_cursor']
+
+    while cursor:
+        response = client.get(f'/livros/?ano=2024&cursor={cursor}')
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['total'] is None
+        ids += [livro['id'] for livro in response.json()['livros']]
+        cursor = response.json()['next_cursor']
+
+    assert len(ids) == total_livros
+    assert ids == sorted(ids)
+
+
+def test_get_livros_cursor_vazio_inicia_do_comeco(client, romancista, livro):
+    response = client.get('/livros/?cursor=')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['livros'][0]['id'] == livro.id
+    assert response.json()['next_cursor'] is None
+
+
+def test_get_livros_cursor_invalido(client):
+    response = client.get('/livros/?cursor=invalido')
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'cursor inválido'}
+
+
+@pytest.mark.parametrize('count', ['exact', 'estimate'])
+def test_get_livros_count_com_total(session, client, romancista, count):
+    session.bulk_save_objects(LivroFactory.create_batch(size=30, ano=2024))
+    session.commit()
+
+    response = client.get(f'/livros/?ano=2024&count={count}')
+
+    assert response.status_code == HTTPStatus.OK
+    assert isinstance(response.json()['total'], int)
+    assert isinstance(response.json()['pages'], int)
+
+
+def test_get_livros_count_none(session, client, romancista):
+    session.bulk_save_objects(LivroFactory.create_batch(size=30, ano=2024))
+    session.commit()
+
+    response = client.get('/livros/?ano=2024&count=none')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['total'] is None
+    assert response.json()['pages'] is None
+    assert len(response.json()['livros']) == response.json()['size']
+    assert response.json()['next_cursor'] is not None
+
+
+def test_create_livros_bulk(client, token, romancista, livro):
+    response = client.post(
+        '/livros/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'titulo': 'Dom Casmurro', 'ano': 1899, 'romancista_id': 1},
+            {'titulo': 'dom casmurro.', 'ano': 1899, 'romancista_id': 1},
+            {'titulo': livro.titulo, 'ano': 1900, 'romancista_id': 1},
+            {'titulo': 'Quincas Borba', 'ano': 1891, 'romancista_id': 999},
+            {'titulo': 'Helena'},
+        ],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == 1
+    assert [r['status'] for r in response.json()['resultados']] == [
+        'criado',
+        'duplicado',
+        'duplicado',
+        'romancista_nao_encontrado',
+        'invalido',
+    ]
+    assert response.json()['resultados'][0]['id'] == livro.id + 1
+
+
+def test_create_livros_bulk_ndjson(client, token, romancista, monkeypatch):
+    monkeypatch.setattr(livros.settings, 'BULK_BATCH_SIZE', 2)
+    total_livros = 5
+    corpo = '\n'.join(
+        json.dumps({'titulo': f'livro {i}', 'ano': 2000, 'romancista_id': 1})
+        for i in range(total_livros)
+    )
+
+    response = client.post(
+        '/livros/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=corpo,
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == total_livros
+    assert {r['status'] for r in response.json()['resultados']} == {'criado'}
+
+
+def test_create_livros_bulk_ndjson_linha_malformada(client, token, romancista):
+    corpo = '\n'.join([
+        json.dumps({
+            'titulo': 'Dom Casmurro',
+            'ano': 1899,
+            'romancista_id': 1,
+        }),
+        '{"titulo": "Helena", ',
+        json.dumps({'titulo': 'Iaiá Garcia', 'ano': 1878, 'romancista_id': 1}),
+    ])
+
+    response = client.post(
+        '/livros/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=corpo,
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == 2  # noqa: PLR2004
+    assert [r['status'] for r in response.json()['resultados']] == [
+        'criado',
+        'invalido',
+        'criado',
+    ]
+
+
+def test_create_livros_bulk_acima_do_limite_de_parametros(client, token):
+    # Mais romancistas distintos que os 65535 parâmetros do Postgres
+    total_livros = 70_000
+    corpo = '\n'.join(
+        json.dumps({'titulo': f'livro {i}', 'ano': 2000, 'romancista_id': i})
+        for i in range(total_livros)
+    )
+
+    response = client.post(
+        '/livros/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=corpo,
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == 0
+    assert {r['status'] for r in response.json()['resultados']} == {
+        'romancista_nao_encontrado'
+    }
+
+
+def test_create_livros_bulk_corpo_invalido(client, token):
+    response = client.post(
+        '/livros/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'titulo': 'Dom Casmurro'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.usefixtures('_metricas_habilitadas')
+def test_get_livro_by_id_usa_cache(session, client, romancista, livro):
+    client.get(f'/livros/{livro.id}')
+    session.delete(livro)
+    session.commit()
+
+    response = client.get(f'/livros/{livro.id}')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['titulo'] == livro.titulo
+    stats = client.get('/metricas/cache/respostas').json()
+    assert stats['hits'] == 1
+    # O livro no primeiro GET e, no acerto, a marca de romancista excluído
+    assert stats['misses'] == 2  # noqa: PLR2004
+
+
+def test_patch_livro_invalida_cache(client, token, romancista, livro):
+    client.get(f'/livros/{livro.id}')
+
+    client.patch(
+        f'/livros/{livro.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1888},
+    )
+    response = client.get(f'/livros/{livro.id}')
+
+    assert response.json()['ano'] == 1888  # noqa: PLR2004
+
+
+def test_get_livro_concorrente_nao_regrava_linha_antiga(
+    client, token, romancista, livro, monkeypatch
+):
+    async def intercala():
+        lida, patch_concluido = asyncio.Event(), asyncio.Event()
+
+        async def busca_livro(session, livro_id):
+            # O GET lê a linha, e o PATCH grava e invalida antes do set
+            linha = await consultas.busca_livro(session, livro_id)
+            lida.set()
+            await patch_concluido.wait()
+            return linha
+
+        monkeypatch.setattr(livros, 'busca_livro', busca_livro)
+        async with AsyncClient(
+            transport=ASGITransport(app=client.app), base_url='http://test'
+        ) as ac:
+            get = asyncio.create_task(ac.get(f'/livros/{livro.id}'))
+            await lida.wait()
+            await ac.patch(
+                f'/livros/{livro.id}',
+                headers={'Authorization': f'Bearer {token}'},
+                json={'ano': 1888},
+            )
+            patch_concluido.set()
+            await get
+
+    asyncio.run(intercala())
+    response = client.get(f'/livros/{livro.id}')
+
+    assert response.json()['ano'] == 1888  # noqa: PLR2004
+
+
+def test_get_livro_by_id_if_none_match(client, token, romancista, livro):
+    response = client.get(f'/livros/{livro.id}')
+    etag = response.headers['ETag']
+
+    response = client.get(
+        f'/livros/{livro.id}', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not response.content
+
+    client.patch(
+        f'/livros/{livro.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1888},
+    )
+    response = client.get(
+        f'/livros/{livro.id}', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+def test_get_livros_if_none_match(session, client, romancista, livro):
+    response = client.get('/livros/')
+    etag = response.headers['ETag']
+
+    response = client.get('/livros/', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    session.add(LivroFactory())
+    session.commit()
+    response = client.get('/livros/', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['total'] == 2  # noqa: PLR2004
+
+
+def test_get_livros_expand_romancista(session, client, romancista):
+    session.bulk_save_objects(LivroFactory.create_batch(size=3))
+    session.commit()
+
+    response = client.get('/livros/?expand=romancista')
+
+    assert response.status_code == HTTPStatus.OK
+    assert 'ETag' not in response.headers
+    for livro in response.json()['livros']:
+        assert livro['romancista'] == {
+            'id': romancista.id,
+            'nome': romancista.nome,
+        }
+
+
+def test_get_livros_lote_preserva_ordem(session, client, romancista):
+    livros_db = LivroFactory.create_batch(size=3)
+    session.add_all(livros_db)
+    session.commit()
+    ids = [livros_db[2].id, 999, livros_db[0].id, livros_db[2].id]
+
+    response = client.get('/livros/lote', params={'ids': ids})
+
+    assert response.status_code == HTTPStatus.OK
+    assert [i['id'] for i in response.json()['livros']] == [
+        livros_db[2].id,
+        livros_db[0].id,
+    ]
+    assert response.json()['nao_encontrados'] == [999]
+
+
+def test_get_livros_lote_acima_do_limite(client, monkeypatch):
+    monkeypatch.setattr(livros.settings, 'BATCH_FETCH_MAX_IDS', 2)
+
+    response = client.get('/livros/lote', params={'ids': [1, 2, 3]})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'no máximo 2 ids por requisição'}
+
+
+def test_get_livros_lote_sem_ids(client):
+    response = client.get('/livros/lote')
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_get_livros_formato_de_livro_list(client, romancista, livro):
+    response = client.get('/livros/')
+
+    assert response.status_code == HTTPStatus.OK
+    assert list(response.json()) == list(LivroList.model_fields)
+    assert response.json()['livros'] == [
+        LivroPublic.model_validate(livro, from_attributes=True).model_dump()
+    ]
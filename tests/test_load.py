@@ -0,0 +1,72 @@
+import json
+
+from sqlalchemy.sql import func, select
+
+from madr.load import main
+from madr.models import Livro, Romancista
+
+
+def test_load_romancistas_e_livros(session, engine, tmp_path, capsys):
+    database_url = engine.url.render_as_string(hide_password=False)
+    romancistas = tmp_path / 'romancistas.csv'
+    romancistas.write_text(
+        'nome\nMachado de Assis\nmachado  de assis.\nClarice Lispector\n',
+        encoding='utf-8',
+    )
+    livros = tmp_path / 'livros.ndjson'
+    livros.write_text(
+        '\n'.join(
+            json.dumps(livro)
+            for livro in [
+                {
+                    'titulo': 'Dom Casmurro',
+                    'ano': 1899,
+                    'romancista': 'Machado de Assis',
+                },
+                {
+                    'titulo': 'A Hora da Estrela',
+                    'ano': 1977,
+                    'romancista': 'clarice lispector',
+                },
+                {
+                    'titulo': 'Dom Casmurro!',
+                    'ano': 1899,
+                    'romancista': 'Machado de Assis',
+                },
+                {'titulo': 'Sem Autor', 'ano': 2000, 'romancista': 'ninguém'},
+            ]
+        ),
+        encoding='utf-8',
+    )
+
+    main(['romancistas', str(romancistas), '--database-url', database_url])
+    main(['livros', str(livros), '--database-url', database_url])
+
+    total_romancistas = session.scalar(
+        select(func.count()).select_from(Romancista)
+    )
+    assert total_romancistas == len(['machado de assis', 'clarice lispector'])
+    titulos = session.scalars(select(Livro.titulo).order_by(Livro.titulo))
+    assert list(titulos) == ['a hora da estrela', 'dom casmurro']
+    assert 'livros: 2 inseridas, 2 ignoradas' in capsys.readouterr().err
+
+
+def test_load_livros_ignora_romancista_excluido(
+    session, engine, romancista, tmp_path
+):
+    romancista.excluido = True
+    session.commit()
+    livros = tmp_path / 'livros.csv'
+    livros.write_text(
+        f'titulo,ano,romancista\nDom Casmurro,1899,{romancista.nome}\n',
+        encoding='utf-8',
+    )
+
+    main([
+        'livros',
+        str(livros),
+        '--database-url',
+        engine.url.render_as_string(hide_password=False),
+    ])
+
+    assert session.scalar(select(func.count()).select_from(Livro)) == 0
@@ -0,0 +1,59 @@
+import sqlite3
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from madr import database
+from madr.database import MedeEspera, PoolMetrics
+from madr.settings import Settings
+
+
+def test_metricas_desligadas_por_padrao(client):
+    response = client.get('/metricas/pool')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.usefixtures('_metricas_habilitadas')
+def test_read_pool_status(client):
+    response = client.get('/metricas/pool')
+
+    assert response.status_code == HTTPStatus.OK
+    assert set(response.json()) == {
+        'size',
+        'checked_in',
+        'checked_out',
+        'overflow',
+        'connects',
+        'checkouts',
+        'timeouts',
+        'wait_count',
+        'wait_seconds_total',
+        'wait_seconds_max',
+    }
+    assert response.json()['size'] == Settings().DATABASE_POOL_SIZE
+
+
+def test_pool_medido_registra_espera_e_timeout(monkeypatch):
+    metricas = PoolMetrics()
+    monkeypatch.setattr(database, 'pool_metrics', metricas)
+
+    class PoolTeste(MedeEspera, QueuePool):
+        pass
+
+    pool = PoolTeste(
+        lambda: sqlite3.connect(':memory:'),
+        pool_size=1,
+        max_overflow=0,
+        timeout=0.01,
+    )
+    conexao = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    conexao.close()
+
+    assert metricas.wait_count == 2  # noqa: PLR2004
+    assert metricas.timeouts == 1
+    assert metricas.wait_seconds_max >= 0.01  # noqa: PLR2004
@@ -0,0 +1,144 @@
+from hashlib import md5
+
+import pytest
+from sqlalchemy import Text, cast, event, func, insert, select, text
+
+from madr.models import Livro, Romancista
+from madr.paginacao import encode_cursor
+
+LIVROS = 20_000
+ROMANCISTAS = 20_000
+ANOS = 200
+
+pytestmark = pytest.mark.usefixtures('_catalogo')
+
+
+@pytest.fixture
+def _catalogo(session):
+    n = func.generate_series(1, ROMANCISTAS).column_valued('n')
+    session.execute(
+        insert(Romancista).from_select(
+            ['nome'], select(func.md5(cast(n, Text)))
+        )
+    )
+    n = func.generate_series(1, LIVROS).column_valued('n')
+    session.execute(
+        insert(Livro).from_select(
+            ['titulo', 'ano', 'romancista_id'],
+            select(
+                func.concat('livro ', func.md5(cast(n, Text))),
+                1800 + n % ANOS,
+                1 + n % ROMANCISTAS,
+            ),
+        )
+    )
+    # Como faria o autovacuum: tira as entradas da pending list dos GIN
+    for indice in ('ix_livros_titulo_trgm', 'ix_romancistas_nome_trgm'):
+        session.execute(select(func.gin_clean_pending_list(indice)))
+    session.execute(text('ANALYZE livros'))
+    session.execute(text('ANALYZE romancistas'))
+    session.commit()
+
+
+@pytest.fixture
+def consultas(async_engine):
+    # Guarda o SQL que os endpoints realmente emitem, para o EXPLAIN
+    emitidas = []
+
+    def registra(conn, cursor, statement, parameters, *args):
+        emitidas.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', registra)
+    yield emitidas
+    event.remove(async_engine.sync_engine, 'before_cursor_execute', registra)
+
+
+def _indices(session, statement, parameters) -> set[str]:
+    plano = session.connection().exec_driver_sql(
+        'EXPLAIN (FORMAT JSON) ' + statement, parameters
+    )
+    nos = [plano.scalar()[0]['Plan']]
+    indices = set()
+    while nos:
+        no = nos.pop()
+        if 'Index Name' in no:
+            indices.add(no['Index Name'])
+        nos.extend(no.get('Plans', []))
+
+    return indices
+
+
+def _md5(n: int) -> str:
+    # Trecho do nome gerado no catálogo: seletivo como um nome real
+    return md5(str(n).encode()).hexdigest()[:12]
+
+
+def _consulta(consultas, trecho):
+    return next(
+        (statement, parameters)
+        for statement, parameters in consultas
+        if trecho in statement
+    )
+
+
+def test_filtro_por_ano_usa_indice(session, client, consultas):
+    client.get('/livros/', params={'ano': 1900})
+
+    statement, parameters = _consulta(consultas, 'LIMIT')
+
+    assert 'ix_livros_ano_id' in _indices(session, statement, parameters)
+
+
+@pytest.mark.parametrize('busca', ['parcial', 'relevancia'])
+def test_busca_por_titulo_usa_indice_trigram(
+    session, client, consultas, busca
+):
+    client.get('/livros/', params={'titulo': _md5(12345), 'busca': busca})
+
+    statement, parameters = _consulta(consultas, 'LIMIT')
+
+    assert 'ix_livros_titulo_trgm' in _indices(session, statement, parameters)
+
+
+@pytest.mark.parametrize('busca', ['parcial', 'relevancia'])
+def test_busca_por_nome_usa_indice_trigram(session, client, consultas, busca):
+    client.get('/romancistas/', params={'nome': _md5(4321), 'busca': busca})
+
+    statement, parameters = _consulta(consultas, 'LIMIT')
+
+    assert 'ix_romancistas_nome_trgm' in _indices(
+        session, statement, parameters
+    )
+
+
+def test_cursor_usa_chave_primaria(session, client, consultas):
+    client.get('/livros/', params={'cursor': encode_cursor(LIVROS // 2)})
+
+    statement, parameters = _consulta(consultas, 'LIMIT')
+
+    assert 'livros_pkey' in _indices(session, statement, parameters)
+
+
+def test_lote_da_purga_usa_indice_do_romancista(
+    session, client, token, consultas
+):
+    client.delete(
+        '/romancistas/1?modo=lotes',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    statement, parameters = _consulta(consultas, 'DELETE FROM livros')
+
+    assert 'ix_livros_romancista_id_id' in _indices(
+        session, statement, parameters
+    )
+
+
+def test_livros_visiveis_usam_indice_parcial(session, client, consultas):
+    client.get('/livros/')
+
+    statement, parameters = _consulta(consultas, 'LIMIT')
+
+    assert 'ix_romancistas_excluido' in _indices(
+        session, statement, parameters
+    )
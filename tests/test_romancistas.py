@@ -1,9 +1,13 @@
 from http import HTTPStatus
 
 import pytest
+from sqlalchemy import event, func, select
 
+from madr import purga
+from madr.models import Livro, Romancista
+from madr.routers import romancistas
 from madr.utils import sanitiza_nome
-from tests.conftest import RomancistaFactory
+from tests.conftest import LivroFactory, RomancistaFactory
 
 
 def test_create_romancista(client, token):
@@ -201,3 +205,366 @@ def test_get_livro(  # noqa
     )
     if expected_romancistas == 0:
         assert response.json()['romancistas'] == []
+
+
+def test_get_romancistas_busca_relevancia(session, client):
+    session.add_all([
+        RomancistaFactory(nome='machado de assis'),
+        RomancistaFactory(nome='clarice lispector'),
+    ])
+    session.commit()
+
+    response = client.get(
+        '/romancistas/?nome=machdo de assis&busca=relevancia'
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['romancistas'][0]['nome'] == 'machado de assis'
+    assert response.json()['total'] == 1
+
+
+def test_get_romancistas_cursor(session, client):
+    total_romancistas = 25
+    session.bulk_save_objects(
+        RomancistaFactory.create_batch(size=total_romancistas)
+    )
+    session.commit()
+
+    first = client.get('/romancistas/?nome=roman').json()
+    second = client.get(
+        f'/romancistas/?nome=roman&cursor={first["next_cursor"]}'
+    ).json()
+
+    assert (
+        len(first['romancistas']) + len(second['romancistas'])
+        == total_romancistas
+    )
+    assert second['next_cursor'] is None
+
+
+def test_get_romancistas_cursor_com_relevancia(client):
+    response = client.get('/romancistas/?nome=roman&busca=relevancia&cursor=')
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_create_romancistas_bulk(client, token, romancista):
+    response = client.post(
+        '/romancistas/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'nome': 'Machado de Assis'},
+            {'nome': 'machado  de assis.'},
+            {'nome': romancista.nome},
+            {'nome': 'Clarice Lispector'},
+        ],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == 2  # noqa: PLR2004
+    assert response.json()['romancistas'] == {
+        'machado de assis': romancista.id + 1,
+        romancista.nome: romancista.id,
+        'clarice lispector': romancista.id + 2,
+    }
+
+
+def test_create_romancistas_bulk_em_varios_lotes(
+    client, token, romancista, async_engine, monkeypatch
+):
+    monkeypatch.setattr(romancistas.settings, 'BULK_BATCH_SIZE', 2)
+    total_romancistas = 5
+    nomes = [romancista.nome] + [
+        f'romancista novo {i}' for i in range(total_romancistas)
+    ]
+    buscas = []
+
+    def registra(conn, cursor, statement, parameters, *args):
+        if statement.startswith('SELECT romancistas.nome'):
+            buscas.append(parameters)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', registra)
+    try:
+        response = client.post(
+            '/romancistas/bulk',
+            headers={'Authorization': f'Bearer {token}'},
+            json=[{'nome': nome} for nome in nomes],
+        )
+    finally:
+        event.remove(
+            async_engine.sync_engine, 'before_cursor_execute', registra
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == total_romancistas
+    assert response.json()['romancistas'] == {
+        nome: romancista.id + indice for indice, nome in enumerate(nomes)
+    }
+    # Um único parâmetro (array) por mais nomes que o lote tenha: o limite
+    # de 65535 parâmetros do Postgres não se aplica
+    assert [len(parametros) for parametros in buscas] == [1]
+
+
+def test_create_romancistas_bulk_com_romancista_excluido(
+    session, client, token, romancista
+):
+    romancista.excluido = True
+    session.commit()
+
+    response = client.post(
+        '/romancistas/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[{'nome': romancista.nome}, {'nome': 'Clarice Lispector'}],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'criados': 1,
+        'romancistas': {'clarice lispector': romancista.id + 1},
+        'excluidos': [romancista.nome],
+    }
+
+
+def test_create_romancistas_bulk_acima_do_limite(client, token, monkeypatch):
+    monkeypatch.setattr(romancistas.settings, 'BULK_MAX_ITEMS', 2)
+
+    response = client.post(
+        '/romancistas/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[{'nome': f'romancista {i}'} for i in range(3)],
+    )
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert response.json() == {'detail': 'no máximo 2 itens por lote'}
+
+
+def test_create_romancistas_bulk_without_token(client):
+    response = client.post(
+        '/romancistas/bulk',
+        headers={'Authorization': 'Bearer 1234'},
+        json=[{'nome': 'Machado de Assis'}],
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_patch_romancista_invalida_cache(client, token, romancista):
+    client.get(f'/romancistas/{romancista.id}')
+
+    client.patch(
+        f'/romancistas/{romancista.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Machado de Assis'},
+    )
+    response = client.get(f'/romancistas/{romancista.id}')
+
+    assert response.json()['nome'] == 'machado de assis'
+
+
+def test_get_romancista_by_id_if_none_match(client, romancista):
+    response = client.get(f'/romancistas/{romancista.id}')
+
+    response = client.get(
+        f'/romancistas/{romancista.id}',
+        headers={'If-None-Match': response.headers['ETag']},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_get_romancistas_if_none_match(client, romancista):
+    response = client.get('/romancistas/?nome=roman')
+    etag = response.headers['ETag']
+
+    response = client.get(
+        '/romancistas/?nome=roman', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    response = client.get(
+        '/romancistas/?nome=romancista', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_get_romancista_by_id_expand_livros(session, client, romancista):
+    session.bulk_save_objects(LivroFactory.create_batch(size=2))
+    session.commit()
+
+    response = client.get(f'/romancistas/{romancista.id}?expand=livros')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['nome'] == romancista.nome
+    assert len(response.json()['livros']) == 2  # noqa: PLR2004
+    assert response.json()['livros'][0]['romancista_id'] == romancista.id
+
+
+def test_get_romancista_by_id_expand_livros_not_found(client):
+    response = client.get('/romancistas/999?expand=livros')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_get_romancistas_lote(session, client):
+    romancistas_db = RomancistaFactory.create_batch(size=2)
+    session.add_all(romancistas_db)
+    session.commit()
+    ids = [romancistas_db[1].id, romancistas_db[0].id, 999]
+
+    response = client.get('/romancistas/lote', params={'ids': ids})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'romancistas': [
+            {'id': romancistas_db[1].id, 'nome': romancistas_db[1].nome},
+            {'id': romancistas_db[0].id, 'nome': romancistas_db[0].nome},
+        ],
+        'nao_encontrados': [999],
+    }
+
+
+def test_delete_romancista_apaga_livros_em_cascata(
+    session, client, token, romancista, livro
+):
+    # Popula o cache do livro antes de apagar o romancista
+    client.get(f'/livros/{livro.id}')
+
+    response = client.delete(
+        f'/romancistas/{romancista.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert client.get(f'/romancistas/{romancista.id}').status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+    assert client.get(f'/livros/{livro.id}').status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+
+
+def test_delete_romancista_emite_um_unico_delete(
+    session, client, token, romancista, async_engine
+):
+    session.bulk_save_objects(LivroFactory.create_batch(size=50))
+    session.commit()
+    deletes = []
+
+    def registra(conn, cursor, statement, *args):
+        if statement.startswith('DELETE'):
+            deletes.append(statement)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', registra)
+    try:
+        client.delete(
+            f'/romancistas/{romancista.id}',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+    finally:
+        event.remove(
+            async_engine.sync_engine, 'before_cursor_execute', registra
+        )
+
+    assert len(deletes) == 1
+    assert session.scalar(select(func.count()).select_from(Livro)) == 0
+
+
+def test_delete_romancista_em_lotes(
+    session, client, token, romancista, monkeypatch
+):
+    monkeypatch.setattr(purga.settings, 'PURGE_BATCH_SIZE', 2)
+    session.bulk_save_objects(LivroFactory.create_batch(size=5))
+    session.commit()
+
+    response = client.delete(
+        f'/romancistas/{romancista.id}?modo=lotes',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()['romancista_id'] == romancista.id
+
+    response = client.get(response.headers['Location'])
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['status'] == 'concluida'
+    assert response.json()['livros_apagados'] == 5  # noqa: PLR2004
+    assert session.scalar(select(func.count()).select_from(Livro)) == 0
+    assert session.scalar(select(func.count()).select_from(Romancista)) == 0
+
+
+def test_delete_romancista_em_lotes_not_found(client, token):
+    response = client.delete(
+        '/romancistas/999?modo=lotes',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'romancista não encontrado'}
+
+
+def test_romancista_excluido_fica_oculto(session, client, romancista, livro):
+    romancista.excluido = True
+    session.commit()
+
+    assert client.get(f'/romancistas/{romancista.id}').status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+    assert (
+        client.get('/romancistas/', params={'nome': romancista.nome}).json()[
+            'romancistas'
+        ]
+        == []
+    )
+    assert client.get('/livros/').json()['livros'] == []
+    assert client.get(f'/livros/{livro.id}').status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+    assert client.get('/livros/lote', params={'ids': [livro.id]}).json() == {
+        'livros': [],
+        'nao_encontrados': [livro.id],
+    }
+    assert client.get(
+        '/romancistas/lote', params={'ids': [romancista.id]}
+    ).json() == {'romancistas': [], 'nao_encontrados': [romancista.id]}
+    assert not client.get('/export/livros').text
+
+
+def test_patch_romancista_excluido(session, client, token, romancista):
+    romancista.excluido = True
+    session.commit()
+
+    response = client.patch(
+        f'/romancistas/{romancista.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Machado de Assis'},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'romancista não encontrado'}
+
+
+def test_delete_em_lotes_limpa_livros_do_cache(
+    client, token, romancista, livro, monkeypatch
+):
+    # A purga fica para depois: o livro já lido não pode sair do cache
+    monkeypatch.setattr(
+        'madr.routers.romancistas.executa_purga', lambda *args: None
+    )
+    client.get(f'/livros/{livro.id}')
+
+    client.delete(
+        f'/romancistas/{romancista.id}?modo=lotes',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert client.get(f'/livros/{livro.id}').status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+
+
+def test_read_purga_not_found(client):
+    response = client.get('/romancistas/purgas/inexistente')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'purga não encontrada'}
@@ -1,17 +1,35 @@
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from http import HTTPStatus
 
 import pytest
 from fastapi import HTTPException
+from fastapi.testclient import TestClient
 from freezegun import freeze_time
 from jwt import decode
-
-from madr.security import create_access_token, get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr import security
+from madr.app import app
+from madr.security import (
+    create_access_token,
+    decode_access_token,
+    get_current_user,
+    get_hash_executor,
+    get_password_hash_async,
+    verify_password,
+)
 from madr.settings import Settings
 
 settings = Settings()
 
 
+async def _get_current_user(async_engine, token):
+    async with AsyncSession(async_engine) as session:
+        return await get_current_user(session=session, token=token)
+
+
 def test_jwt():
     data = {'test': 'test'}
     token = create_access_token(data)
@@ -51,17 +69,173 @@ def test_token_expires(client, user):
         assert response.json() == {'detail': 'Não autorizado'}
 
 
-def test_get_current_user_without_email_must_return_exception(session):
+def test_get_current_user_without_email_must_return_exception(
+    session, async_engine
+):
     data = {}
     token = create_access_token(data)
 
     with pytest.raises(HTTPException):
-        get_current_user(session=session, token=token)
+        asyncio.run(_get_current_user(async_engine, token))
 
 
-def test_get_current_user_with_invalid_email_must_return_exception(session):
+def test_get_current_user_with_invalid_email_must_return_exception(
+    session, async_engine
+):
     data = {'sub': 'thisemaildoestnotexist@test.com'}
     token = create_access_token(data)
 
     with pytest.raises(HTTPException):
-        get_current_user(session=session, token=token)
+        asyncio.run(_get_current_user(async_engine, token))
+
+
+def test_get_password_hash_async():
+    hashed = asyncio.run(get_password_hash_async('senha'))
+
+    assert verify_password('senha', hashed)
+
+
+def test_token_when_hash_executor_is_saturated(client, user, monkeypatch):
+    monkeypatch.setattr(security.settings, 'PASSWORD_HASH_MAX_PENDING', 0)
+
+    response = client.post(
+        '/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == '1'
+
+
+class _PoolQuebrado:
+    @staticmethod
+    def submit(*args, **kwargs):
+        raise BrokenProcessPool
+
+    @staticmethod
+    def shutdown(*args, **kwargs):
+        pass
+
+
+def test_token_recupera_pool_de_hash_quebrado(client, user, monkeypatch):
+    monkeypatch.setattr(security, '_hash_executor', _PoolQuebrado())
+    form = {'username': user.email, 'password': user.clean_password}
+
+    response = client.post('/token', data=form)
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert client.post('/token', data=form).status_code == HTTPStatus.OK
+
+
+def test_lifespan_encerra_pool_de_hash(monkeypatch):
+    monkeypatch.setattr(security.settings, 'PASSWORD_HASH_EXECUTOR', 'process')
+    with TestClient(app):
+        executor = get_hash_executor()
+
+    assert security._hash_executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+
+
+def test_token_carries_user_claims(client, user, token):
+    decoded = decode(token, settings.SECRET_KEY, [settings.ALGORITHM])
+
+    assert decoded['sub'] == user.email
+    assert decoded['uid'] == user.id
+    assert decoded['username'] == user.username
+
+
+def test_stateless_auth_trusts_claims(client, token, monkeypatch):
+    monkeypatch.setattr(security.settings, 'STATELESS_AUTH', True)
+
+    response = client.post(
+        '/romancistas/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Machado de Assis'},
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
+
+
+def test_stateless_auth_rejects_deleted_user(
+    client, session, user, token, monkeypatch
+):
+    monkeypatch.setattr(security.settings, 'STATELESS_AUTH', True)
+    session.delete(user)
+    session.commit()
+
+    response = client.post(
+        '/romancistas/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Machado de Assis'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json() == {'detail': 'Não autorizado'}
+
+
+def test_stateless_auth_rejects_token_with_old_username(
+    client, user, token, monkeypatch
+):
+    monkeypatch.setattr(security.settings, 'STATELESS_AUTH', True)
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/romancistas/', headers=headers, json={'nome': 'Machado'})
+    client.put(
+        f'/user/{user.id}',
+        headers=headers,
+        json={
+            'username': 'outro',
+            'email': user.email,
+            'password': user.clean_password,
+        },
+    )
+
+    response = client.post(
+        '/romancistas/', headers=headers, json={'nome': 'Machado de Assis'}
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.usefixtures('_metricas_habilitadas')
+def test_current_user_is_served_from_cache(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/refresh-token', headers=headers)
+    client.post('/refresh-token', headers=headers)
+
+    stats = client.get('/metricas/cache/usuarios').json()
+
+    assert stats['size'] == 1
+    assert stats['hits'] >= 1
+
+
+def test_deleted_user_is_evicted_from_cache(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/refresh-token', headers=headers)
+
+    client.delete(f'/user/{user.id}', headers=headers)
+    response = client.post('/refresh-token', headers=headers)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_decoded_token_is_cached():
+    security.token_cache.clear()
+    token = create_access_token({'sub': 'test@test.com'})
+
+    first = decode_access_token(token)
+    hits = security.token_cache.hits
+    second = decode_access_token(token)
+
+    assert first == second
+    assert security.token_cache.hits == hits + 1
+
+
+def test_token_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(security.settings, 'TOKEN_CACHE_ENABLED', False)
+    security.token_cache.clear()
+    token = create_access_token({'sub': 'test@test.com'})
+
+    decode_access_token(token)
+
+    assert len(security.token_cache) == 0